@@ -5,11 +5,21 @@ from .langgraph_agent import LangGraphAgent
 # from .langgraph_cloud_agent import LangGraphCloudAgent
 from .state import CopilotKitState
 from .parameter import Parameter
+from .executor import ActionExecutor, ProcessActionExecutor
+from .blob_store import BlobStore
+from .cache import ActionCache, CacheBackend, MemoryCacheBackend, SQLiteCacheBackend
 __all__ = [
     'CopilotKitSDK', 
     'Action', 
     'LangGraphAgent', 
     # 'LangGraphCloudAgent', 
     'CopilotKitState', 
-    'Parameter'
+    'Parameter',
+    'ActionExecutor',
+    'ProcessActionExecutor',
+    'ActionCache',
+    'CacheBackend',
+    'MemoryCacheBackend',
+    'SQLiteCacheBackend',
+    'BlobStore'
 ]
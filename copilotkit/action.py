@@ -1,9 +1,26 @@
 """Actions"""
 
 
-from inspect import iscoroutinefunction
-from typing import Optional, List, Callable, TypedDict, Any, cast
+import asyncio
+from contextlib import asynccontextmanager
+from inspect import iscoroutinefunction, isasyncgenfunction, isawaitable
+from typing import (
+    Optional,
+    List,
+    Callable,
+    TypedDict,
+    Any,
+    Union,
+    Literal,
+    AsyncIterator,
+    cast
+)
+from typing_extensions import NotRequired
 from .parameter import Parameter, normalize_parameters
+from .executor import ActionExecutor
+from .cache import ActionCache
+from .validation import ArgumentError, compile_validator
+from .exc import ActionArgumentsException, ActionOverloadedException, ActionTimeoutException
 
 class ActionDict(TypedDict):
     """Dict representation of an action"""
@@ -15,6 +32,36 @@ class ActionResultDict(TypedDict):
     """Dict representation of an action result"""
     result: Any
 
+class ActionStreamFrameDict(TypedDict):
+    """A frame of a streamed action result"""
+    partial: NotRequired[Any]
+    result: NotRequired[Any]
+    error: NotRequired[str]
+
+class ActionCallDict(TypedDict):
+    """Dict representation of an action call in a batch"""
+    name: str
+    arguments: NotRequired[dict]
+    id: NotRequired[str]
+
+class ActionBatchResultDict(TypedDict):
+    """Dict representation of the result of an action call in a batch"""
+    index: int
+    id: NotRequired[str]
+    name: str
+    status: int
+    result: NotRequired[Any]
+    error: NotRequired[str]
+    errors: NotRequired[List[ArgumentError]]
+
+_default_executor = ActionExecutor()
+
+def aggregate_partial_results(partials: List[Any]) -> Any:
+    """Join partial string results, otherwise return the list of partial results"""
+    if partials and all(isinstance(partial, str) for partial in partials):
+        return "".join(partials)
+    return partials
+
 class Action:  # pylint: disable=too-few-public-methods
     """Action class for CopilotKit"""
     def __init__(
@@ -24,22 +71,181 @@ class Action:  # pylint: disable=too-few-public-methods
             handler: Callable,
             description: Optional[str] = None,
             parameters: Optional[List[Parameter]] = None,
+            executor: Optional[Union[ActionExecutor, Literal["inline"]]] = None,
+            timeout: Optional[float] = None,
+            max_concurrency: Optional[int] = None,
+            max_queued: Optional[int] = None,
+            cache: Optional[ActionCache] = None,
+            aggregate: Optional[Callable[[List[Any]], Any]] = None,
         ):
         self.name = name
         self.description = description
         self.parameters = parameters
         self.handler = handler
+        # async generator handlers stream partial results, which are combined
+        # into the final result with `aggregate`
+        self.streaming = isasyncgenfunction(handler)
+        self.aggregate = aggregate or aggregate_partial_results
+        # where synchronous handlers run: a dedicated executor, "inline" on the
+        # event loop for trivially cheap handlers, or None for the SDK's executor
+        self.executor = executor
+        if isinstance(executor, ActionExecutor):
+            executor.check_handler(name, handler)
+        # seconds until the execution is cancelled
+        self.timeout = timeout
+        # how many executions may run at the same time, and how many may wait
+        # for a slot before new executions are rejected
+        self.max_concurrency = max_concurrency
+        self.max_queued = max_queued
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._queued = 0
+        # memoizes the results of idempotent actions
+        self.cache = cache
+        self._validate = compile_validator(normalize_parameters(cast(Any, parameters)))
 
     async def execute(
             self,
             *,
-            arguments: dict
+            arguments: dict,
+            default_executor: Optional[ActionExecutor] = None,
+            properties: Optional[dict] = None
         ) -> ActionResultDict:
         """Execute the action"""
-        result = self.handler(**arguments)
+        arguments = self._validated(arguments)
+
+        if self.cache is None:
+            return await self._execute_limited(arguments, default_executor)
+
+        # cache hits don't take a concurrency slot
+        key = self.cache.key(name=self.name, arguments=arguments, properties=properties)
+
+        async def execute():
+            return (await self._execute_limited(arguments, default_executor))["result"]
+
+        return {
+            "result": await self.cache.get_or_execute(key, execute)
+        }
+
+    async def stream(
+            self,
+            *,
+            arguments: dict,
+            default_executor: Optional[ActionExecutor] = None,
+            properties: Optional[dict] = None
+        ) -> AsyncIterator[ActionStreamFrameDict]:
+        """
+        Execute the action, yielding a {"partial": ...} frame for each value yielded by
+        an async generator handler and a final {"result": ...} frame with the
+        aggregated result. Other handlers only yield the final frame.
+        """
+        if not self.streaming:
+            yield await self.execute(
+                arguments=arguments,
+                default_executor=default_executor,
+                properties=properties
+            )
+            return
+
+        arguments = self._validated(arguments)
+        partials = []
+        async with self._slot():
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.timeout if self.timeout is not None else None
+            generator = self.handler(**arguments)
+            try:
+                while True:
+                    try:
+                        partial = await asyncio.wait_for(
+                            generator.__anext__(),
+                            max(0.0, deadline - loop.time()) if deadline is not None else None
+                        )
+                    except StopAsyncIteration:
+                        break
+                    except asyncio.TimeoutError as exc:
+                        raise ActionTimeoutException(self.name, cast(float, self.timeout)) from exc
+                    partials.append(partial)
+                    yield {"partial": partial}
+            finally:
+                await generator.aclose()
+
+        yield {"result": self.aggregate(partials)}
+
+    def _validated(self, arguments: dict) -> dict:
+        arguments, errors = self._validate(arguments)
+        if errors:
+            raise ActionArgumentsException(self.name, errors)
+        return arguments
+
+    @asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """Wait for a concurrency slot"""
+        if self.max_concurrency is None:
+            yield
+            return
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        if (self._semaphore.locked() and
+            self.max_queued is not None and
+            self._queued >= self.max_queued):
+            raise ActionOverloadedException(self.name)
+
+        self._queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    async def _execute_limited(
+            self,
+            arguments: dict,
+            default_executor: Optional[ActionExecutor]
+        ) -> ActionResultDict:
+        async with self._slot():
+            return await self._execute_with_timeout(arguments, default_executor)
+
+    async def _execute_with_timeout(
+            self,
+            arguments: dict,
+            default_executor: Optional[ActionExecutor]
+        ) -> ActionResultDict:
+        if self.timeout is None:
+            return await self._execute(arguments, default_executor)
+
+        # Note that handlers running in an executor can't be interrupted, they
+        # keep running in the background after the timeout
+        try:
+            return await asyncio.wait_for(
+                self._execute(arguments, default_executor),
+                self.timeout
+            )
+        except asyncio.TimeoutError as exc:
+            raise ActionTimeoutException(self.name, self.timeout) from exc
+
+    async def _execute(
+            self,
+            arguments: dict,
+            default_executor: Optional[ActionExecutor]
+        ) -> ActionResultDict:
+        if self.streaming:
+            return {
+                "result": self.aggregate([partial async for partial in self.handler(**arguments)])
+            }
+
+        if iscoroutinefunction(self.handler) or self.executor == "inline":
+            result = self.handler(**arguments)
+        else:
+            executor = cast(ActionExecutor, self.executor or default_executor or _default_executor)
+            result = await executor.run(self.handler, **arguments)
 
         return {
-            "result": await result if iscoroutinefunction(self.handler) else result
+            "result": await result if isawaitable(result) else result
         }
 
     def dict_repr(self) -> ActionDict:
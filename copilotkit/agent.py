@@ -2,8 +2,10 @@
 
 from typing import Optional, List, TypedDict
 from abc import ABC, abstractmethod
-from .types import Message
+from inspect import Parameter, signature
+from .types import Message, StreamOptions
 from .action import ActionDict
+from .blob_store import BlobStore
 
 class AgentDict(TypedDict):
     """Agent dictionary"""
@@ -30,8 +32,26 @@ class Agent(ABC):
         thread_id: Optional[str] = None,
         node_name: Optional[str] = None,
         actions: Optional[List[ActionDict]] = None,
+        stream_options: Optional[StreamOptions] = None,
+        last_message_id: Optional[str] = None,
+        blob_store: Optional[BlobStore] = None,
     ):
-        """Execute the agent"""
+        """
+        Execute the agent.
+
+        If last_message_id is set, messages only contains the messages after it.
+        Results in messages may be references to blobs in blob_store.
+        """
+
+    def accepts_execute_argument(self, name: str) -> bool:
+        """
+        Whether execute takes the keyword argument `name`. Agents written for
+        earlier versions of the SDK don't take the arguments added since.
+        """
+        parameters = signature(self.execute).parameters
+        return name in parameters or any(
+            parameter.kind is Parameter.VAR_KEYWORD for parameter in parameters.values()
+        )
 
     def dict_repr(self) -> AgentDict:
         """Dict representation of the action"""
@@ -0,0 +1,165 @@
+"""Content-addressed storage for large action results"""
+
+import os
+import re
+import json
+import asyncio
+import hashlib
+import tempfile
+from typing import Any, List, Optional, TypedDict, cast
+from .cache import LRUCache
+from .exc import BlobNotFoundException
+from .types import Message
+
+_BLOB_ID = re.compile(r"^[0-9a-f]{64}$")
+
+BLOB_REFERENCE_KEY = "copilotkit_blob"
+
+class BlobReference(TypedDict):
+    """Reference to a stored action result"""
+    id: str
+    size: int
+    mediaType: str
+    preview: str
+
+class BlobStore:
+    """
+    Stores action results larger than `threshold` bytes in a local directory,
+    keyed by the SHA-256 of their content.
+
+    Offloaded results are replaced by {"copilotkit_blob": BlobReference}, so
+    clients don't send the full result back with every later request. The
+    content can be fetched in pages from the blobs endpoint of the integration,
+    and references in result messages are resolved when converting messages
+    for the agent.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            *,
+            threshold: int = 256 * 1024,
+            preview_size: int = 1024,
+            cache_bytes: int = 16 * 1024 * 1024
+        ):
+        self.path = path
+        self.threshold = threshold
+        self.preview_size = preview_size
+        # blobs are immutable, so resolved content can be cached without invalidation
+        self._cache: LRUCache[str] = LRUCache(max_entries=1024, max_size=cache_bytes)
+        os.makedirs(path, exist_ok=True)
+
+    def _blob_path(self, blob_id: str) -> str:
+        if not _BLOB_ID.match(blob_id):
+            raise BlobNotFoundException(blob_id)
+        return os.path.join(self.path, blob_id[:2], blob_id)
+
+    def put(self, data: bytes) -> str:
+        """Store data, returning its id"""
+        blob_id = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(blob_id)
+        if os.path.exists(path):
+            return blob_id
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so that readers never see partial blobs
+        fd, temporary_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(data)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+        return blob_id
+
+    def size(self, blob_id: str) -> int:
+        """Get the size of a blob in bytes"""
+        try:
+            return os.path.getsize(self._blob_path(blob_id))
+        except FileNotFoundError as exc:
+            raise BlobNotFoundException(blob_id) from exc
+
+    def read(self, blob_id: str, offset: int = 0, length: Optional[int] = None) -> bytes:
+        """Read `length` bytes of a blob starting at `offset`, or the rest of it"""
+        try:
+            with open(self._blob_path(blob_id), "rb") as file:
+                file.seek(offset)
+                return file.read() if length is None else file.read(length)
+        except FileNotFoundError as exc:
+            raise BlobNotFoundException(blob_id) from exc
+
+    def offload(self, result: Any) -> Any:
+        """Store the result if it's larger than the threshold, returning a reference"""
+        if isinstance(result, str):
+            data, media_type = result.encode("utf-8"), "text/plain"
+        else:
+            try:
+                data, media_type = json.dumps(result).encode("utf-8"), "application/json"
+            except (TypeError, ValueError):
+                return result
+
+        if len(data) <= self.threshold:
+            return result
+
+        reference: BlobReference = {
+            "id": self.put(data),
+            "size": len(data),
+            "mediaType": media_type,
+            "preview": data[:self.preview_size].decode("utf-8", errors="ignore"),
+        }
+        return {BLOB_REFERENCE_KEY: reference}
+
+    def resolve(self, value: str) -> str:
+        """
+        Resolve a result message that holds a blob reference to the content of
+        the blob, other values are returned unchanged. Reads from disk, use
+        `aresolve` on the event loop.
+        """
+        reference = parse_blob_reference(value)
+        if reference is None:
+            return value
+
+        content = self._cache.get(reference["id"])
+        if content is None:
+            content = self.read(reference["id"]).decode("utf-8")
+            self._cache.set(reference["id"], content, size=len(content))
+        return content
+
+    async def aresolve(self, value: str) -> str:
+        """Resolve a result like `resolve`, reading the blob in a worker thread"""
+        reference = parse_blob_reference(value)
+        if reference is None:
+            return value
+        content = self._cache.get(reference["id"])
+        if content is not None:
+            return content
+        return await asyncio.to_thread(self.resolve, value)
+
+    async def resolve_messages(self, messages: List[Message]) -> List[Message]:
+        """Resolve the blob references in result messages, returning new messages"""
+        resolved = []
+        for message in messages:
+            if "actionExecutionId" in message:
+                result = await self.aresolve(message["result"])
+                if result is not message["result"]:
+                    message = cast(Message, {**message, "result": result})
+            resolved.append(message)
+        return resolved
+
+def parse_blob_reference(value: Any) -> Optional[BlobReference]:
+    """Get the blob reference of a result, None if it's not a reference"""
+    if isinstance(value, str):
+        # cheap check before parsing, most results are not references
+        if not value.startswith("{") or BLOB_REFERENCE_KEY not in value[:32]:
+            return None
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+
+    if isinstance(value, dict) and len(value) == 1 and isinstance(
+        value.get(BLOB_REFERENCE_KEY), dict
+    ):
+        return cast(BlobReference, value[BLOB_REFERENCE_KEY])
+    return None
@@ -0,0 +1,291 @@
+"""Caching utilities for CopilotKit"""
+
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+def fingerprint(value: Any) -> str:
+    """Stable fingerprint of a JSON-like value, independent of dict key order"""
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class LRUCache(Generic[V]):
+    """In-memory cache with LRU eviction and an optional TTL and size limit"""
+
+    def __init__(
+            self,
+            *,
+            max_entries: int = 128,
+            ttl: Optional[float] = None,
+            max_size: Optional[int] = None
+        ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_size = max_size
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[float, V, int]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[V]:
+        """Get a value, None if it's missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, _ = entry
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: V, *, size: int = 0, ttl: Optional[float] = None):
+        """
+        Set a value, evicting the least recently used values if the cache is full.
+        `size` counts towards max_size, `ttl` overrides the cache's TTL.
+        """
+        ttl = ttl if ttl is not None else self.ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else float("inf")
+        self.delete(key)
+        self._entries[key] = (expires_at, value, size)
+        self.size += size
+        while self._entries and (
+            len(self._entries) > self.max_entries or
+            (self.max_size is not None and self.size > self.max_size)
+        ):
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+
+    def delete(self, key: str):
+        """Delete a value"""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[2]
+
+    def clear(self):
+        """Delete all values"""
+        self._entries.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+class CacheBackend(ABC):
+    """Storage for cached action results, values are encoded as bytes"""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Get a value, None if it's missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float]):
+        """Set a value that expires after ttl seconds (never if None)"""
+
+    @abstractmethod
+    async def clear(self):
+        """Delete all values"""
+
+class MemoryCacheBackend(CacheBackend):
+    """In-memory LRU cache backend, limited by entries and optionally bytes"""
+
+    def __init__(self, *, max_entries: int = 1024, max_bytes: Optional[int] = None):
+        self._cache: LRUCache[bytes] = LRUCache(max_entries=max_entries, max_size=max_bytes)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float]):
+        self._cache.set(key, value, size=len(value), ttl=ttl)
+
+    async def clear(self):
+        self._cache.clear()
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Cache backend storing values in a local SQLite file.
+
+    Expired values are deleted when values are set. If max_entries or max_bytes
+    is set, the least recently used values are evicted to stay within them.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            *,
+            max_entries: Optional[int] = None,
+            max_bytes: Optional[int] = None
+        ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._lock: Optional[asyncio.Lock] = None
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS copilotkit_cache " +
+                "(key TEXT PRIMARY KEY, value BLOB, size INTEGER, " +
+                "expires_at REAL, accessed_at REAL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS copilotkit_cache_accessed_at " +
+                "ON copilotkit_cache (accessed_at)"
+            )
+
+    async def _run(self, fn: Callable[[sqlite3.Connection], Any]) -> Any:
+        def run():
+            with self._connection:
+                return fn(self._connection)
+        # created lazily, so that it's bound to the running loop
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            return await asyncio.to_thread(run)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        def get(connection: sqlite3.Connection) -> Optional[bytes]:
+            now = time.time()
+            row = connection.execute(
+                "SELECT value FROM copilotkit_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE copilotkit_cache SET accessed_at = ? WHERE key = ?",
+                (now, key)
+            )
+            return row[0]
+        return await self._run(get)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float]):
+        def set_value(connection: sqlite3.Connection):
+            now = time.time()
+            expires_at = now + ttl if ttl is not None else float("inf")
+            connection.execute(
+                "INSERT OR REPLACE INTO copilotkit_cache " +
+                "(key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), expires_at, now)
+            )
+            connection.execute("DELETE FROM copilotkit_cache WHERE expires_at <= ?", (now,))
+            self._evict(connection)
+        await self._run(set_value)
+
+    def _evict(self, connection: sqlite3.Connection):
+        if self.max_entries is not None:
+            connection.execute(
+                "DELETE FROM copilotkit_cache WHERE key IN (" +
+                "SELECT key FROM copilotkit_cache ORDER BY accessed_at DESC, rowid DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        if self.max_bytes is not None:
+            (total,) = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM copilotkit_cache"
+            ).fetchone()
+            if total <= self.max_bytes:
+                return
+            evicted = []
+            for key, size in connection.execute(
+                "SELECT key, size FROM copilotkit_cache ORDER BY accessed_at ASC, rowid ASC"
+            ).fetchall():
+                if total <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                total -= size
+            connection.executemany("DELETE FROM copilotkit_cache WHERE key = ?", evicted)
+
+    async def clear(self):
+        await self._run(lambda connection: connection.execute("DELETE FROM copilotkit_cache"))
+
+class _Flight: # pylint: disable=too-few-public-methods
+    """An execution shared by concurrent calls with the same key"""
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.waiters = 0
+
+class ActionCache:
+    """
+    Memoizes the results of an idempotent action.
+
+    Results are keyed by the action name, the arguments and the values of
+    `context_keys` in the context properties, and stored as JSON in `backend`
+    (an in-memory LRU by default). Concurrent calls with the same key are
+    executed only once.
+    """
+
+    def __init__(
+            self,
+            *,
+            ttl: Optional[float] = None,
+            max_entries: int = 1024,
+            max_bytes: Optional[int] = None,
+            context_keys: Optional[List[str]] = None,
+            backend: Optional[CacheBackend] = None,
+        ):
+        self.ttl = ttl
+        self.context_keys = context_keys or []
+        self.backend = backend or MemoryCacheBackend(
+            max_entries=max_entries,
+            max_bytes=max_bytes
+        )
+        self._in_flight: Dict[str, _Flight] = {}
+
+    def key(self, *, name: str, arguments: dict, properties: Optional[dict]) -> str:
+        """Get the cache key of an action call"""
+        if not isinstance(properties, dict):
+            properties = {}
+        return fingerprint({
+            "name": name,
+            "arguments": arguments,
+            "context": {key: properties.get(key) for key in self.context_keys},
+        })
+
+    async def get_or_execute(self, key: str, execute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Get the cached result for key, or execute and cache it.
+
+        The execution runs in its own task, shared by all concurrent calls with
+        the same key. A caller being cancelled doesn't cancel it for the others,
+        it's only cancelled once all callers are gone.
+        """
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(self._load_or_execute(key, execute)))
+            self._in_flight[key] = flight
+
+            def done(_, flight=flight):
+                if self._in_flight.get(key) is flight:
+                    del self._in_flight[key]
+            flight.task.add_done_callback(done)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+
+    async def _load_or_execute(self, key: str, execute: Callable[[], Awaitable[Any]]) -> Any:
+        cached = await self.backend.get(key)
+        if cached is not None:
+            return json.loads(cached)
+        result = await execute()
+        await self._store(key, result)
+        return result
+
+    async def _store(self, key: str, result: Any):
+        try:
+            value = json.dumps(result).encode("utf-8")
+        except (TypeError, ValueError):
+            # results that can't be encoded as JSON are not cached
+            return
+        await self.backend.set(key, value, self.ttl)
+
+    async def clear(self):
+        """Delete all cached results"""
+        await self.backend.clear()
@@ -0,0 +1,121 @@
+"""HTTP content encodings for CopilotKit streams and request bodies"""
+
+import zlib
+from typing import AsyncIterator, Callable, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError: # pragma: no cover
+    zstandard = None # type: ignore
+
+# preferred encodings first
+SUPPORTED_ENCODINGS = (("zstd",) if zstandard is not None else ()) + ("gzip", "deflate")
+
+# limit for decompressed request bodies, to guard against decompression bombs
+MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024
+
+_ZLIB_WBITS = {
+    "gzip": 16 + zlib.MAX_WBITS,
+    # HTTP deflate is the zlib format
+    "deflate": zlib.MAX_WBITS,
+}
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the content encoding for a response from an Accept-Encoding header"""
+    if not accept_encoding:
+        return None
+
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, *parameters = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+
+    candidates = [
+        encoding for encoding in SUPPORTED_ENCODINGS
+        if qualities.get(encoding, qualities.get("*", 0.0)) > 0
+    ]
+    if not candidates:
+        return None
+    # highest quality wins, ties are broken by our preference
+    return max(
+        candidates,
+        key=lambda encoding: (
+            qualities.get(encoding, qualities.get("*", 0.0)),
+            -SUPPORTED_ENCODINGS.index(encoding)
+        )
+    )
+
+def _stream_compressor(encoding: str) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """Get (compress and flush a chunk, finish) functions for encoding"""
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        return (
+            lambda chunk: (
+                compressor.compress(chunk) +
+                compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+            ),
+            compressor.flush
+        )
+
+    compressobj = zlib.compressobj(6, zlib.DEFLATED, _ZLIB_WBITS[encoding])
+    return (
+        lambda chunk: compressobj.compress(chunk) + compressobj.flush(zlib.Z_SYNC_FLUSH),
+        compressobj.flush
+    )
+
+async def compress_stream(chunks: AsyncIterator[bytes], encoding: str) -> AsyncIterator[bytes]:
+    """
+    Compress a stream, flushing after every chunk so that the client can decode
+    each chunk as soon as it arrives. Chunks should be batched beforehand, see
+    `stream.coalesce_writes`, since every flush costs a few bytes.
+    """
+    compress, finish = _stream_compressor(encoding)
+    async for chunk in chunks:
+        yield compress(chunk)
+    yield finish()
+
+def decompress_body(body: bytes, encoding: Optional[str]) -> bytes:
+    """
+    Decompress a request body with the given Content-Encoding.
+
+    Raises ValueError for unsupported encodings, invalid data and bodies larger
+    than MAX_DECOMPRESSED_SIZE when decompressed.
+    """
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        return body
+
+    if encoding == "zstd" and zstandard is not None:
+        try:
+            chunks = []
+            size = 0
+            with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+                while size <= MAX_DECOMPRESSED_SIZE:
+                    chunk = reader.read(1024 * 1024)
+                    if not chunk:
+                        break
+                    chunks.append(chunk)
+                    size += len(chunk)
+            data = b"".join(chunks)
+        except zstandard.ZstdError as exc:
+            raise ValueError(f"Invalid zstd body: {exc}") from exc
+    elif encoding in _ZLIB_WBITS:
+        try:
+            decompressobj = zlib.decompressobj(_ZLIB_WBITS[encoding])
+            data = decompressobj.decompress(body, MAX_DECOMPRESSED_SIZE + 1)
+        except zlib.error as exc:
+            raise ValueError(f"Invalid {encoding} body: {exc}") from exc
+    else:
+        raise ValueError(f"Unsupported content encoding: {encoding}")
+
+    if len(data) > MAX_DECOMPRESSED_SIZE:
+        raise ValueError("Decompressed body is too large")
+    return data
@@ -0,0 +1,77 @@
+"""
+In-process emission channel for CopilotKit.
+
+While an agent streams its events, nodes can emit state, messages and tool calls
+through the channel of the current context instead of going through LangChain's
+callback system.
+"""
+
+import uuid
+import asyncio
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Optional
+
+_current_channel: ContextVar[Optional["EmissionChannel"]] = ContextVar(
+    "copilotkit_emission_channel",
+    default=None
+)
+
+_DONE = object()
+
+class _Error: # pylint: disable=too-few-public-methods
+    def __init__(self, error: BaseException):
+        self.error = error
+
+class EmissionChannel:
+    """Merges emissions from nodes into a stream of LangGraph events"""
+
+    def __init__(self, maxsize: int = 16):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    @staticmethod
+    def current() -> Optional["EmissionChannel"]:
+        """Get the channel of the current context, if any"""
+        return _current_channel.get()
+
+    async def emit(self, *, metadata: Dict[str, Any], output: Any):
+        """
+        Emit a payload. It is delivered as an on_chain_end event with the given
+        metadata, like the events of the callback based emit functions.
+        """
+        await self.queue.put({
+            "event": "on_chain_end",
+            "name": "copilotkit_emit",
+            "run_id": str(uuid.uuid4()),
+            "tags": [],
+            "metadata": metadata,
+            "data": {"output": output},
+        })
+
+    async def merge(self, events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+        """
+        Iterate `events` with this channel bound, yielding the events together
+        with everything emitted through the channel.
+
+        `events` must not have started yet, so that the graph runs in a context
+        where the channel is bound.
+        """
+        async def pump():
+            _current_channel.set(self)
+            try:
+                async for event in events:
+                    await self.queue.put(event)
+                await self.queue.put(_DONE)
+            except Exception as exc: # pylint: disable=broad-except
+                await self.queue.put(_Error(exc))
+
+        task = asyncio.create_task(pump())
+        try:
+            while True:
+                item = await self.queue.get()
+                if item is _DONE:
+                    break
+                if isinstance(item, _Error):
+                    raise item.error
+                yield item
+        finally:
+            task.cancel()
@@ -29,3 +29,48 @@ class AgentExecutionException(Exception):
         self.name = name
         self.error = error
         super().__init__(f"Agent '{name}' failed to execute: {error}")
+
+class MessagesOutOfSyncException(Exception):
+    """Exception raised when the messages sent by the client don't match the thread state."""
+
+    def __init__(self, name: str, last_message_id: str):
+        self.name = name
+        self.last_message_id = last_message_id
+        super().__init__(
+            f"Message '{last_message_id}' not found in the state of agent '{name}', " +
+            "send all messages to resync."
+        )
+
+class ActionArgumentsException(Exception):
+    """Exception raised when the arguments of an action call are invalid."""
+
+    def __init__(self, name: str, errors: list):
+        self.name = name
+        self.errors = errors
+        details = "; ".join(
+            f"{error['path']} {error['message']}" if error["path"] else error["message"]
+            for error in errors
+        )
+        super().__init__(f"Invalid arguments for action '{name}': {details}")
+
+class ActionOverloadedException(Exception):
+    """Exception raised when an action has too many pending executions."""
+
+    def __init__(self, name: str):
+        self.name = name
+        super().__init__(f"Action '{name}' is overloaded, try again later.")
+
+class ActionTimeoutException(Exception):
+    """Exception raised when an action does not finish in time."""
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        super().__init__(f"Action '{name}' timed out after {timeout} seconds.")
+
+class BlobNotFoundException(Exception):
+    """Exception raised when a blob is not found."""
+
+    def __init__(self, blob_id: str):
+        self.blob_id = blob_id
+        super().__init__(f"Blob '{blob_id}' not found.")
@@ -0,0 +1,147 @@
+"""Executors for running synchronous action handlers off the event loop"""
+
+import os
+import pickle
+import asyncio
+import functools
+import contextvars
+import multiprocessing
+from inspect import iscoroutinefunction, isasyncgenfunction
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypedDict
+
+class ActionExecutorStats(TypedDict):
+    """Action executor stats"""
+    max_workers: int
+    running: int
+    queued: int
+    completed: int
+    saturation: float
+
+class ActionExecutor:
+    """
+    Thread pool for synchronous action handlers.
+
+    Pass an instance to CopilotKitSDK to set the default executor for all actions,
+    or to an Action to give it a dedicated pool. `stats` reports how saturated the
+    pool is.
+    """
+
+    def __init__(self, *, max_workers: Optional[int] = None):
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self._executor: Optional[Executor] = None
+        self._in_flight = 0
+        self._completed = 0
+
+    def _create_executor(self) -> Executor:
+        return ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="copilotkit-action"
+        )
+
+    def check_handler(self, name: str, handler: Callable): # pylint: disable=unused-argument
+        """Check that the handler of an action can run in this executor"""
+
+    def _prepare_call(self, fn: Callable, kwargs: dict) -> Callable[[], Any]:
+        # run the handler with the context of the caller
+        return functools.partial(contextvars.copy_context().run, fn, **kwargs)
+
+    async def run(self, fn: Callable, **kwargs) -> Any:
+        """Run fn(**kwargs) in the pool"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+
+        loop = asyncio.get_running_loop()
+        self._in_flight += 1
+        try:
+            return await loop.run_in_executor(self._executor, self._prepare_call(fn, kwargs))
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+
+    def stats(self) -> ActionExecutorStats:
+        """Get the current pool stats"""
+        return {
+            "max_workers": self.max_workers,
+            "running": min(self._in_flight, self.max_workers),
+            "queued": max(0, self._in_flight - self.max_workers),
+            "completed": self._completed,
+            "saturation": self._in_flight / self.max_workers,
+        }
+
+    def shutdown(self, wait: bool = True):
+        """Shut down the pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+def _call_pickled(payload: bytes) -> bytes:
+    fn, kwargs = pickle.loads(payload)
+    return pickle.dumps(fn(**kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+
+def _warm_up() -> int:
+    return os.getpid()
+
+class ProcessActionExecutor(ActionExecutor):
+    """
+    Process pool for CPU-bound synchronous action handlers.
+
+    Handlers run in worker processes, so they don't compete for the GIL with
+    the event loop. Handlers, arguments and results must be picklable; handlers
+    are checked when the action is created. Call `start` to spawn the workers
+    ahead of the first execution. Context variables are not passed to the
+    workers.
+    """
+
+    def __init__(
+            self,
+            *,
+            max_workers: Optional[int] = None,
+            mp_context: Optional[Any] = None
+        ):
+        super().__init__(max_workers=max_workers or os.cpu_count() or 1)
+        # spawn by default, forking a process with a running event loop is unsafe
+        self.mp_context = mp_context or multiprocessing.get_context("spawn")
+
+    def _create_executor(self) -> Executor:
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=self.mp_context)
+
+    def check_handler(self, name: str, handler: Callable):
+        if iscoroutinefunction(handler) or isasyncgenfunction(handler):
+            raise ValueError(
+                f"Action '{name}' has an async handler, which can't run in a process pool."
+            )
+        try:
+            pickle.dumps(handler, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as exc:
+            raise ValueError(
+                f"The handler of action '{name}' can't be pickled, define it at " +
+                f"the top level of a module to run it in a process pool: {exc}"
+            ) from exc
+
+    def _prepare_call(self, fn: Callable, kwargs: dict) -> Callable[[], Any]:
+        # pickle the call once with the most efficient protocol, the pool
+        # only needs to transfer the bytes
+        return functools.partial(
+            _call_pickled,
+            pickle.dumps((fn, kwargs), protocol=pickle.HIGHEST_PROTOCOL)
+        )
+
+    async def start(self):
+        """Spawn all worker processes"""
+        if self._executor is None:
+            self._executor = self._create_executor()
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self._executor, _warm_up)
+            for _ in range(self.max_workers)
+        ])
+
+    async def run(self, fn: Callable, **kwargs) -> Any:
+        try:
+            return pickle.loads(await super().run(fn, **kwargs))
+        except BrokenProcessPool:
+            # a worker died, start a new pool for the next executions
+            self.shutdown(wait=False)
+            raise
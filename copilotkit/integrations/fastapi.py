@@ -1,19 +1,34 @@
 """FastAPI integration"""
 
+import json
+import asyncio
 import logging
 
-from typing import List, Any, cast
+from typing import List, Any, AsyncIterator, Awaitable, Optional, Tuple, cast
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from ..sdk import CopilotKitSDK, CopilotKitSDKContext
-from ..types import Message
+from ..types import Message, StreamOptions
 from ..exc import (
     ActionNotFoundException,
     ActionExecutionException,
+    ActionArgumentsException,
+    ActionOverloadedException,
+    ActionTimeoutException,
     AgentNotFoundException,
     AgentExecutionException,
+    MessagesOutOfSyncException,
+    BlobNotFoundException,
+)
+from ..action import ActionDict, ActionCallDict
+from ..stream import HEARTBEAT_EVENT, coalesce_writes
+from ..msgpack_framing import MSGPACK_MEDIA_TYPE, accepts_msgpack, msgpack_available, pack_frame
+from ..compression import (
+    SUPPORTED_ENCODINGS,
+    compress_stream,
+    decompress_body,
+    negotiate_encoding
 )
-from ..action import ActionDict
 
 logging.basicConfig(level=logging.ERROR)
 logger = logging.getLogger(__name__)
@@ -43,13 +58,33 @@ def body_get_or_raise(body: Any, key: str):
 async def handler(request: Request, sdk: CopilotKitSDK):
     """Handle FastAPI request"""
 
+    path = request.path_params.get('path')
+    method = request.method
+
+    if method == 'GET' and path.startswith('blobs/'):
+        return await handle_read_blob(
+            sdk=sdk,
+            blob_id=path[len('blobs/'):],
+            range_header=request.headers.get("range"),
+            offset=request.query_params.get("offset"),
+            limit=request.query_params.get("limit"),
+        )
+
+    content_encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if content_encoding not in ("identity",) + SUPPORTED_ENCODINGS:
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported content encoding: {content_encoding}"
+        )
+    try:
+        raw_body = decompress_body(await request.body(), content_encoding)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
     try:
-        body = await request.json()
+        body = json.loads(raw_body)
     except Exception as exc:
         raise HTTPException(status_code=400, detail="Request body is required") from exc
-
-    path = request.path_params.get('path')
-    method = request.method
     context = cast(
         CopilotKitSDKContext, 
         {
@@ -59,17 +94,40 @@ async def handler(request: Request, sdk: CopilotKitSDK):
     )
 
     if method == 'POST' and path == 'info':
-        return await handle_info(sdk=sdk, context=context)
+        return await handle_info(
+            sdk=sdk,
+            context=context,
+            if_none_match=request.headers.get("if-none-match")
+        )
 
     if method == 'POST' and path == 'actions/execute':
         name = body_get_or_raise(body, "name")
         arguments = body.get("arguments", {})
 
-        return await handle_execute_action(
-            sdk=sdk,
-            context=context,
-            name=name,
-            arguments=arguments,
+        return await _cancel_on_disconnect(
+            request,
+            handle_execute_action(
+                sdk=sdk,
+                context=context,
+                name=name,
+                arguments=arguments,
+                stream=body.get("stream", False),
+            )
+        )
+
+    if method == 'POST' and path == 'actions/execute_batch':
+        calls = cast(List[ActionCallDict], body_get_or_raise(body, "actions"))
+        for call in calls:
+            body_get_or_raise(call, "name")
+
+        return await _cancel_on_disconnect(
+            request,
+            handle_execute_actions(
+                sdk=sdk,
+                context=context,
+                calls=calls,
+                stream=body.get("stream", False),
+            )
         )
 
     if method == 'POST' and path == 'agents/execute':
@@ -80,8 +138,15 @@ async def handler(request: Request, sdk: CopilotKitSDK):
         state = body_get_or_raise(body, "state")
         messages = body_get_or_raise(body, "messages")
         actions = cast(List[ActionDict], body.get("actions", []))
+        stream_options = cast(StreamOptions, body.get("streamOptions", {}))
+        if accepts_msgpack(request.headers.get("accept")):
+            stream_options = {**stream_options, "framing": "msgpack"}
+        elif stream_options.get("framing") == "msgpack" and not msgpack_available():
+            # fall back to JSON lines, which the agent sends without a MessagePack library
+            stream_options = {**stream_options, "framing": "json"}
+        last_message_id = body.get("lastMessageId")
 
-        return handle_execute_agent(
+        return await handle_execute_agent(
             sdk=sdk,
             context=context,
             thread_id=thread_id,
@@ -90,16 +155,139 @@ async def handler(request: Request, sdk: CopilotKitSDK):
             state=state,
             messages=messages,
             actions=actions,
+            stream_options=stream_options,
+            last_message_id=last_message_id,
+            content_encoding=negotiate_encoding(request.headers.get("accept-encoding")),
         )
 
 
     raise HTTPException(status_code=404, detail="Not found")
 
 
-async def handle_info(*, sdk: CopilotKitSDK, context: CopilotKitSDKContext):
+def _etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(
+        candidate.removeprefix("W/") == etag for candidate in candidates
+    )
+
+async def _cancel_on_disconnect(request: Request, handler_coroutine: Awaitable[Any]):
+    """Run a handler, cancelling it when the client disconnects"""
+    task = asyncio.ensure_future(handler_coroutine)
+
+    async def wait_for_disconnect():
+        while True:
+            message = await request.receive()
+            if message["type"] == "http.disconnect":
+                task.cancel()
+                return
+
+    watcher = asyncio.ensure_future(wait_for_disconnect())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if not task.cancelled():
+            raise
+        logger.info("Client disconnected, cancelled %s", request.url.path)
+        # the client is gone, this response is never sent
+        return Response(status_code=499)
+    finally:
+        watcher.cancel()
+
+async def handle_info(
+        *,
+        sdk: CopilotKitSDK,
+        context: CopilotKitSDKContext,
+        if_none_match: Optional[str] = None
+    ):
     """Handle info request with FastAPI"""
-    result = sdk.info(context=context)
-    return JSONResponse(content=result)
+    body, etag = sdk.info_json(context=context)
+    if _etag_matches(etag, if_none_match):
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+def _parse_position(value: str) -> int:
+    """Parse a non-negative byte position, raising ValueError otherwise"""
+    value = value.strip()
+    if not value.isdigit():
+        raise ValueError(value)
+    return int(value)
+
+def _parse_range(
+        range_header: Optional[str],
+        offset: Optional[str],
+        limit: Optional[str],
+        size: int
+    ) -> Optional[Tuple[int, int]]:
+    """Get the requested (start, end) byte range, end exclusive, None for all bytes"""
+    try:
+        if range_header is not None:
+            unit, _, spec = range_header.partition("=")
+            if unit.strip() != "bytes" or "," in spec:
+                raise ValueError(range_header)
+            first, _, last = spec.strip().partition("-")
+            if not first:
+                return max(0, size - _parse_position(last)), size
+            start = _parse_position(first)
+            end = min(size, _parse_position(last) + 1) if last else size
+            if end <= start and start < size:
+                raise ValueError(range_header)
+            return start, end
+        if offset is not None or limit is not None:
+            start = _parse_position(offset) if offset is not None else 0
+            return start, min(size, start + _parse_position(limit)) if limit is not None else size
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid range") from exc
+    return None
+
+async def handle_read_blob(
+        *,
+        sdk: CopilotKitSDK,
+        blob_id: str,
+        range_header: Optional[str] = None,
+        offset: Optional[str] = None,
+        limit: Optional[str] = None,
+    ):
+    """
+    Handle reading an offloaded action result with FastAPI.
+    Pages can be requested with a Range header or the offset and limit query parameters.
+    """
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": f'"{blob_id}"',
+        # blobs are content addressed and never change
+        "Cache-Control": "public, max-age=31536000, immutable",
+    }
+    try:
+        if sdk.blob_store is None:
+            raise BlobNotFoundException(blob_id)
+        size = await asyncio.to_thread(sdk.blob_store.size, blob_id)
+        byte_range = _parse_range(range_header, offset, limit, size)
+        if byte_range is None:
+            data, _ = await asyncio.to_thread(sdk.read_blob, blob_id=blob_id)
+            return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+        start, end = byte_range
+        if start >= size or end <= start:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{size}"}
+            )
+        data, _ = await asyncio.to_thread(
+            sdk.read_blob,
+            blob_id=blob_id,
+            offset=start,
+            length=end - start
+        )
+        return Response(
+            content=data,
+            status_code=206,
+            media_type="application/octet-stream",
+            headers={**headers, "Content-Range": f"bytes {start}-{end - 1}/{size}"}
+        )
+    except BlobNotFoundException as exc:
+        return JSONResponse(content={"error": str(exc)}, status_code=404)
 
 async def handle_execute_action(
         *,
@@ -107,9 +295,22 @@ async def handle_execute_action(
         context: CopilotKitSDKContext,
         name: str,
         arguments: dict,
+        stream: bool = False,
     ):
-    """Handle execute action request with FastAPI"""
+    """
+    Handle execute action request with FastAPI.
+    If stream is set, partial results are streamed as NDJSON, followed by the result.
+    """
     try:
+        if stream:
+            frames = sdk.stream_action(context=context, name=name, arguments=arguments)
+            # errors before the first frame are reported with a status code
+            first_frame = await frames.__anext__()
+            return StreamingResponse(
+                _encode_action_frames(_prepend(first_frame, frames)),
+                media_type="application/x-ndjson"
+            )
+
         result = await sdk.execute_action(
             context=context,
             name=name,
@@ -119,6 +320,22 @@ async def handle_execute_action(
     except ActionNotFoundException as exc:
         logger.error("Action not found: %s", exc)
         return JSONResponse(content={"error": str(exc)}, status_code=404)
+    except ActionArgumentsException as exc:
+        logger.warning("Invalid action arguments: %s", exc)
+        return JSONResponse(
+            content={"error": str(exc), "code": "invalid_arguments", "errors": exc.errors},
+            status_code=400
+        )
+    except ActionOverloadedException as exc:
+        logger.warning("Action overloaded: %s", exc)
+        return JSONResponse(
+            content={"error": str(exc)},
+            status_code=503,
+            headers={"Retry-After": "1"}
+        )
+    except ActionTimeoutException as exc:
+        logger.error("Action timeout: %s", exc)
+        return JSONResponse(content={"error": str(exc)}, status_code=504)
     except ActionExecutionException as exc:
         logger.error("Action execution error: %s", exc)
         return JSONResponse(content={"error": str(exc)}, status_code=500)
@@ -126,7 +343,55 @@ async def handle_execute_action(
         logger.error("Action execution error: %s", exc)
         return JSONResponse(content={"error": str(exc)}, status_code=500)
 
-def handle_execute_agent( # pylint: disable=too-many-arguments
+async def _encode_action_frames(frames: AsyncIterator[Any]) -> AsyncIterator[str]:
+    try:
+        async for frame in frames:
+            yield json.dumps(frame) + "\n"
+    except Exception as exc: # pylint: disable=broad-except
+        logger.error("Action execution error: %s", exc)
+        yield json.dumps({"error": str(exc)}) + "\n"
+
+async def handle_execute_actions(
+        *,
+        sdk: CopilotKitSDK,
+        context: CopilotKitSDKContext,
+        calls: List[ActionCallDict],
+        stream: bool,
+    ):
+    """
+    Handle execute action batch request with FastAPI.
+    If stream is set, the results are streamed as NDJSON as they complete.
+    """
+    if not stream:
+        results = await sdk.execute_actions(context=context, calls=calls)
+        return JSONResponse(content={"results": results})
+
+    async def stream_results():
+        async for result in sdk.stream_actions(context=context, calls=calls):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+# keep proxies like nginx from buffering or transforming streamed responses
+_STREAM_HEADERS = {
+    "Cache-Control": "no-cache, no-transform",
+    "X-Accel-Buffering": "no",
+}
+
+async def _iterate(events: Any) -> AsyncIterator[Any]:
+    if hasattr(events, "__anext__"):
+        async for event in events:
+            yield event
+    else:
+        for event in events:
+            yield event
+
+async def _prepend(first: Any, events: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    yield first
+    async for event in events:
+        yield event
+
+async def handle_execute_agent( # pylint: disable=too-many-arguments
         *,
         sdk: CopilotKitSDK,
         context: CopilotKitSDKContext,
@@ -136,8 +401,14 @@ def handle_execute_agent( # pylint: disable=too-many-arguments
         state: dict,
         messages: List[Message],
         actions: List[ActionDict],
+        stream_options: Optional[StreamOptions] = None,
+        last_message_id: Optional[str] = None,
+        content_encoding: Optional[str] = None,
     ):
-    """Handle continue agent execution request with FastAPI"""
+    """
+    Handle continue agent execution request with FastAPI.
+    If content_encoding is set, the stream is compressed with it.
+    """
     try:
         events = sdk.execute_agent(
             context=context,
@@ -147,8 +418,49 @@ def handle_execute_agent( # pylint: disable=too-many-arguments
             state=state,
             messages=messages,
             actions=actions,
+            stream_options=stream_options,
+            last_message_id=last_message_id,
+        )
+        # wait for the first event so that errors before streaming starts,
+        # e.g. messages being out of sync, get a proper status code
+        if hasattr(events, "__anext__"):
+            try:
+                events = _prepend(await events.__anext__(), events)
+            except StopAsyncIteration:
+                pass
+        # agents that don't take stream options always send JSON lines
+        if ((stream_options or {}).get("framing") == "msgpack" and
+            sdk.get_agent(context=context, name=name).accepts_execute_argument("stream_options")):
+            media_type = MSGPACK_MEDIA_TYPE
+            writes = coalesce_writes(
+                _iterate(events),
+                heartbeat=pack_frame({"event": HEARTBEAT_EVENT})
+            )
+        else:
+            media_type = "application/x-ndjson"
+            writes = coalesce_writes(_iterate(events))
+
+        if content_encoding is None:
+            return StreamingResponse(
+                writes,
+                media_type=media_type,
+                headers=_STREAM_HEADERS
+            )
+        return StreamingResponse(
+            compress_stream(writes, content_encoding),
+            media_type=media_type,
+            headers={
+                **_STREAM_HEADERS,
+                "Content-Encoding": content_encoding,
+                "Vary": "Accept-Encoding",
+            }
+        )
+    except MessagesOutOfSyncException as exc:
+        logger.info("Messages out of sync: %s", exc)
+        return JSONResponse(
+            content={"error": str(exc), "code": "messages_out_of_sync"},
+            status_code=409
         )
-        return StreamingResponse(events, media_type="application/json")
     except AgentNotFoundException as exc:
         logger.error("Agent not found: %s", exc, exc_info=True)
         return JSONResponse(content={"error": str(exc)}, status_code=404)
@@ -0,0 +1,95 @@
+"""JSON Patch (RFC 6902) style diffs for state sync events"""
+
+import copy
+from typing import Any, List, TypedDict, Literal
+from typing_extensions import NotRequired
+
+class PatchOperation(TypedDict):
+    """
+    A patch operation.
+
+    Besides the RFC 6902 "add", "remove" and "replace" operations, "append" is used
+    to append `value` to the string at `path`, which is how streamed strings grow.
+    """
+    op: Literal["add", "remove", "replace", "append"]
+    path: str
+    value: NotRequired[Any]
+
+def escape_pointer_token(token: Any) -> str:
+    """Escape a JSON pointer reference token (RFC 6901)"""
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+# values that can't be mutated, returned as is by snapshot
+_ATOMIC_TYPES = (str, int, float, bool, type(None))
+
+def snapshot(value: Any) -> Any:
+    """
+    Copy a state value, so that later in-place changes of the original don't
+    change the copy. Lists, tuples and dicts are copied recursively, other
+    objects are deep copied, or shared if they can't be copied.
+    """
+    if isinstance(value, _ATOMIC_TYPES):
+        return value
+    if isinstance(value, dict):
+        return {k: snapshot(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [snapshot(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(snapshot(v) for v in value)
+    try:
+        return copy.deepcopy(value)
+    except Exception: # pylint: disable=broad-except
+        return value
+
+def make_patch(old: Any, new: Any) -> List[PatchOperation]:
+    """
+    Make a patch that turns `old` into `new`.
+
+    The diff is shaped for the way agent state usually changes: lists are
+    compared index by index so that appended items become "add" operations
+    on "/-", and strings that grow become "append" operations. Unchanged
+    sub-objects that are shared between `old` and `new` are skipped by
+    identity, so both values must not be mutated after diffing.
+    """
+    operations: List[PatchOperation] = []
+    _diff(old, new, "", operations)
+    return operations
+
+def _diff(old: Any, new: Any, path: str, operations: List[PatchOperation]):
+    if old is new:
+        return
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old:
+            if key not in new:
+                operations.append({"op": "remove", "path": f"{path}/{escape_pointer_token(key)}"})
+        for key, value in new.items():
+            key_path = f"{path}/{escape_pointer_token(key)}"
+            if key in old:
+                _diff(old[key], value, key_path, operations)
+            else:
+                operations.append({"op": "add", "path": key_path, "value": value})
+        return
+
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        for i in range(common):
+            _diff(old[i], new[i], f"{path}/{i}", operations)
+        for value in new[common:]:
+            operations.append({"op": "add", "path": f"{path}/-", "value": value})
+        for i in range(len(old) - 1, common - 1, -1):
+            operations.append({"op": "remove", "path": f"{path}/{i}"})
+        return
+
+    if (isinstance(old, str) and
+        isinstance(new, str) and
+        len(new) > len(old) and
+        new.startswith(old)):
+        operations.append({"op": "append", "path": path, "value": new[len(old):]})
+        return
+
+    # don't treat 1 and True (or 1 and 1.0) as equal
+    if type(old) is type(new) and old == new:
+        return
+
+    operations.append({"op": "replace", "path": path, "value": new})
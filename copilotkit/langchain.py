@@ -16,12 +16,19 @@ from langchain_core.messages import (
 from langchain_core.runnables import RunnableConfig, RunnableGenerator
 
 from .types import Message, IntermediateStateConfig
+from .emission import EmissionChannel
+from .blob_store import BlobStore
+from .json_patch import snapshot
 
 def copilotkit_messages_to_langchain(
-        use_function_call: bool = False
+        use_function_call: bool = False,
+        blob_store: Optional[BlobStore] = None
     ) -> Callable[[List[Message]], List[BaseMessage]]:
     """
-    Convert CopilotKit messages to LangChain messages
+    Convert CopilotKit messages to LangChain messages.
+    If blob_store is set, results that were offloaded to it are resolved to their content.
+    Agents resolve results of the SDK's blob store before converting, so this is
+    only needed when converting messages outside of an agent.
     """
     def _copilotkit_messages_to_langchain(messages: List[Message]) -> List[BaseMessage]:
         result = []
@@ -62,7 +69,11 @@ def copilotkit_messages_to_langchain(
             elif "actionExecutionId" in message:
                 result.append(ToolMessage(
                     id=message["id"],
-                    content=message["result"],
+                    content=(
+                        blob_store.resolve(message["result"])
+                        if blob_store is not None
+                        else message["result"]
+                    ),
                     name=message["actionName"],
                     tool_call_id=message["actionExecutionId"]
                 ))
@@ -110,6 +121,11 @@ async def copilotkit_exit(config: RunnableConfig):
     """
     Exit CopilotKit
     """
+    channel = EmissionChannel.current()
+    if channel is not None:
+        await channel.emit(metadata={"copilotkit:exit": True}, output="Exit")
+        return True
+
     # For some reason, we need to use this workaround to get custom events to work
     # dispatch_custom_event and friends don't seem to do anything
     gen = RunnableGenerator(_exit_copilotkit_generator).with_config(
@@ -125,6 +141,16 @@ async def copilotkit_exit(config: RunnableConfig):
 
     return True
 
+def _snapshot_state(state: Any) -> Any:
+    """
+    Snapshot the state, since nodes keep updating it after emitting it, e.g.
+    with state["logs"][i]["done"] = True. Messages are not part of state syncs,
+    so they are not copied.
+    """
+    if not isinstance(state, dict):
+        return snapshot(state)
+    return {k: v if k == "messages" else snapshot(v) for k, v in state.items()}
+
 def _emit_copilotkit_state_generator(state):
     async def emit_state(_state: Any): # pylint: disable=unused-argument
         yield state
@@ -135,6 +161,15 @@ async def copilotkit_emit_state(config: RunnableConfig, state: Any):
     """
     Emit CopilotKit state
     """
+    state = _snapshot_state(state)
+    channel = EmissionChannel.current()
+    if channel is not None:
+        await channel.emit(
+            metadata={"copilotkit:force-emit-intermediate-state": True},
+            output=state
+        )
+        return True
+
     gen = RunnableGenerator(_emit_copilotkit_state_generator(state)).with_config(
         metadata={
             "copilotkit:force-emit-intermediate-state": True
@@ -157,6 +192,14 @@ async def copilotkit_emit_message(config: RunnableConfig, message: str):
     """
     Emit CopilotKit message
     """
+    channel = EmissionChannel.current()
+    if channel is not None:
+        await channel.emit(
+            metadata={"copilotkit:manually-emit-message": True},
+            output=message
+        )
+        return True
+
     gen = RunnableGenerator(_emit_copilotkit_message_generator(message)).with_config(
         metadata={
             "copilotkit:manually-emit-message": True
@@ -183,6 +226,18 @@ async def copilotkit_emit_tool_call(config: RunnableConfig, *, name: str, args:
     """
     Emit CopilotKit tool call
     """
+    channel = EmissionChannel.current()
+    if channel is not None:
+        await channel.emit(
+            metadata={"copilotkit:manually-emit-tool-call": True},
+            output={
+                "name": name,
+                "args": args,
+                "id": str(uuid.uuid4())
+            }
+        )
+        return True
+
     gen = RunnableGenerator(_emit_copilotkit_tool_call_generator(name, args)).with_config(
         metadata={
             "copilotkit:manually-emit-tool-call": True
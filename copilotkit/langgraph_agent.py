@@ -1,23 +1,33 @@
 """LangGraph agent for CopilotKit"""
 
 import uuid
-import json
-from typing import Optional, List, Callable, Any, cast, Union, TypedDict
+from typing import Optional, List, Callable, Any, cast, Union, TypedDict, Literal, AsyncIterator
 from typing_extensions import NotRequired
 
 from langgraph.graph.graph import CompiledGraph
-from langchain.load.dump import dumps as langchain_dumps
 from langchain.schema import BaseMessage, SystemMessage
 from langchain_core.runnables import RunnableConfig, ensure_config
 from langchain_core.messages import AIMessage, ToolMessage
 
-from partialjson.json_parser import JSONParser
-
-from .types import Message
+from .streaming_json import IncrementalJSONParser
+from .stream import (
+    Frame,
+    delta_state_syncs,
+    enforce_emit_policies,
+    compact_chat_model_streams,
+    coalesce_state_syncs,
+    session_header_frames
+)
+from .types import Message, StreamOptions
 from .langchain import copilotkit_messages_to_langchain
 from .action import ActionDict
 from .agent import Agent
+from .blob_store import BlobStore
 from .logging import get_logger
+from .exc import MessagesOutOfSyncException
+from .emission import EmissionChannel
+from .msgpack_framing import msgpack_available, pack_frame
+from .serializer import FrameEncoder
 
 logger = get_logger(__name__)
 
@@ -25,6 +35,12 @@ class CopilotKitConfig(TypedDict):
     """CopilotKit config"""
     merge_state: NotRequired[Callable]
     convert_messages: NotRequired[Callable]
+    state_tracking: NotRequired[Literal["checkpoint", "event"]]
+    state_sync: NotRequired[Literal["full", "delta"]]
+    state_sync_snapshot_interval: NotRequired[int]
+    enforce_emit_policies: NotRequired[bool]
+    state_sync_min_interval: NotRequired[float]
+    max_buffered_frames: NotRequired[int]
 
 def langgraph_default_merge_state( # pylint: disable=unused-argument
         *,
@@ -41,12 +57,11 @@ def langgraph_default_merge_state( # pylint: disable=unused-argument
 
     # merge with existing messages
     merged_messages = state.get("messages", [])
-    existing_message_ids = {message.id for message in merged_messages}
-    existing_tool_call_results = set()
-
-    for message in merged_messages:
-        if isinstance(message, ToolMessage):
-            existing_tool_call_results.add(message.tool_call_id)
+    message_indices = {message.id: i for i, message in enumerate(merged_messages)}
+    existing_tool_call_results = {
+        message.tool_call_id for message in merged_messages
+        if isinstance(message, ToolMessage)
+    }
 
     for message in messages:
         # filter tool calls to activate the agent itself
@@ -64,7 +79,9 @@ def langgraph_default_merge_state( # pylint: disable=unused-argument
         ):
             continue
 
-        if message.id not in existing_message_ids:
+        i = message_indices.get(message.id)
+
+        if i is None:
 
             # skip duplicate tool call results
             if (isinstance(message, ToolMessage) and
@@ -75,28 +92,24 @@ def langgraph_default_merge_state( # pylint: disable=unused-argument
                 )
                 continue
 
+            message_indices[message.id] = len(merged_messages)
             merged_messages.append(message)
         else:
             # Replace the message with the existing one
-            for i, existing_message in enumerate(merged_messages):
-                if existing_message.id == message.id:
-                    # if the message is an AIMessage, we need to merge
-                    # the tool calls and additional kwargs
-                    if isinstance(message, AIMessage):
-                        if (
-                            (merged_messages[i].tool_calls or
-                             merged_messages[i].additional_kwargs) and
-                            merged_messages[i].content
-                        ):
-                            message.tool_calls = merged_messages[i].tool_calls
-                            message.additional_kwargs = merged_messages[i].additional_kwargs
-                    merged_messages[i] = message
+            # if the message is an AIMessage, we need to merge
+            # the tool calls and additional kwargs
+            if isinstance(message, AIMessage):
+                if (
+                    (merged_messages[i].tool_calls or
+                     merged_messages[i].additional_kwargs) and
+                    merged_messages[i].content
+                ):
+                    message.tool_calls = merged_messages[i].tool_calls
+                    message.additional_kwargs = merged_messages[i].additional_kwargs
+            merged_messages[i] = message
 
     # fix wrong tool call ids
-    for i, current_message in enumerate(merged_messages):
-        if i == len(merged_messages) - 1:
-            break
-        next_message = merged_messages[i + 1]
+    for current_message, next_message in zip(merged_messages, merged_messages[1:]):
         if (not isinstance(current_message, AIMessage) or
             not isinstance(next_message, ToolMessage)):
             continue
@@ -104,8 +117,6 @@ def langgraph_default_merge_state( # pylint: disable=unused-argument
         if current_message.tool_calls and current_message.tool_calls[0]["id"]:
             next_message.tool_call_id = current_message.tool_calls[0]["id"]
 
-
-
     return {
         **state,
         "messages": merged_messages,
@@ -139,7 +150,7 @@ class LangGraphAgent(Agent):
         if agent is not None:
             logger.warning("Warning: agent is deprecated, use graph instead")
 
-        if merge_state is None:
+        if merge_state is not None:
             logger.warning("Warning: merge_state is deprecated, use copilotkit_config instead")
         
         if graph is None and agent is None:
@@ -165,6 +176,47 @@ class LangGraphAgent(Agent):
             else None
         ) or copilotkit_messages_to_langchain(use_function_call=False)
 
+        # "checkpoint" only reads the state when a checkpoint may have been written,
+        # "event" reads the state on every event
+        self.state_tracking = (
+            copilotkit_config.get("state_tracking")
+            if copilotkit_config
+            else None
+        ) or "checkpoint"
+
+        # "delta" allows sending state syncs as patches against the last sent state
+        # to clients that ask for it with the deltaStateSync stream option
+        self.state_sync = (
+            copilotkit_config.get("state_sync")
+            if copilotkit_config
+            else None
+        ) or "full"
+        self.state_sync_snapshot_interval = (
+            copilotkit_config.get("state_sync_snapshot_interval")
+            if copilotkit_config
+            else None
+        ) or 100
+
+        # drop and trim events the frontend ignores before serializing them
+        self.enforce_emit_policies = (
+            copilotkit_config.get("enforce_emit_policies")
+            if copilotkit_config
+            else None
+        ) or False
+
+        # if set, frames are buffered in a background task and state syncs are
+        # coalesced and sent at most every state_sync_min_interval seconds
+        self.state_sync_min_interval = (
+            copilotkit_config.get("state_sync_min_interval")
+            if copilotkit_config
+            else None
+        )
+        self.max_buffered_frames = (
+            copilotkit_config.get("max_buffered_frames")
+            if copilotkit_config
+            else None
+        ) or 1000
+
         self.langgraph_config = langgraph_config or config
 
         self.graph = cast(CompiledGraph, graph or agent)
@@ -178,11 +230,11 @@ class LangGraphAgent(Agent):
             state: dict,
             running: bool,
             active: bool
-        ):
+        ) -> Frame:
         state_without_messages = {
             k: v for k, v in state.items() if k != "messages"
         }
-        return langchain_dumps({
+        return {
             "event": "on_copilotkit_state_sync",
             "thread_id": thread_id,
             "run_id": run_id,
@@ -192,9 +244,9 @@ class LangGraphAgent(Agent):
             "state": state_without_messages,
             "running": running,
             "role": "assistant"
-        })
+        }
 
-    def execute( # pylint: disable=too-many-arguments            
+    async def execute( # pylint: disable=too-many-arguments,too-many-locals
         self,
         *,
         state: dict,
@@ -202,14 +254,28 @@ class LangGraphAgent(Agent):
         thread_id: Optional[str] = None,
         node_name: Optional[str] = None,
         actions: Optional[List[ActionDict]] = None,
+        stream_options: Optional[StreamOptions] = None,
+        last_message_id: Optional[str] = None,
+        blob_store: Optional[BlobStore] = None,
     ):
+        stream_options = stream_options or {}
         config = ensure_config(cast(Any, self.langgraph_config.copy()) if self.langgraph_config else {}) # pylint: disable=line-too-long
         config["configurable"] = config.get("configurable", {})
         config["configurable"]["thread_id"] = thread_id
 
-        agent_state = self.graph.get_state(config)
+        agent_state = await self.graph.aget_state(config)
         state["messages"] = agent_state.values.get("messages", [])
 
+        # the client only sent the messages after last_message_id,
+        # make sure that the thread has all messages up to it
+        if last_message_id is not None and not any(
+            message.id == last_message_id for message in reversed(state["messages"])
+        ):
+            raise MessagesOutOfSyncException(self.name, last_message_id)
+
+        if blob_store is not None:
+            # offloaded results are read in a worker thread before converting
+            messages = await blob_store.resolve_messages(messages)
         langchain_messages = self.convert_messages(messages)
         state = cast(Callable, self.merge_state)(
             state=state,
@@ -223,15 +289,46 @@ class LangGraphAgent(Agent):
         config["configurable"]["thread_id"] = thread_id
 
         if mode == "continue":
-            self.graph.update_state(config, state, as_node=node_name)
+            await self.graph.aupdate_state(config, state, as_node=node_name)
 
-        return self._stream_events(
+        frames = self._stream_events(
             mode=mode,
             config=config,
             state=state,
             node_name=node_name
         )
 
+        if self.enforce_emit_policies:
+            frames = enforce_emit_policies(frames)
+
+        if stream_options.get("compactEvents"):
+            frames = compact_chat_model_streams(frames)
+
+        if self.state_sync_min_interval is not None:
+            frames = coalesce_state_syncs(
+                frames,
+                min_interval=self.state_sync_min_interval,
+                max_buffered_frames=self.max_buffered_frames
+            )
+
+        if self.state_sync == "delta" and stream_options.get("deltaStateSync"):
+            frames = delta_state_syncs(
+                frames,
+                snapshot_interval=self.state_sync_snapshot_interval
+            )
+
+        if stream_options.get("sessionHeader"):
+            frames = session_header_frames(frames)
+
+        encoder = FrameEncoder(compact_messages=stream_options.get("compactMessages", False))
+        # without a MessagePack library, fall back to JSON lines
+        if stream_options.get("framing") == "msgpack" and msgpack_available():
+            encoded_frames = _encode_msgpack_frames(frames, encoder)
+        else:
+            encoded_frames = _encode_frames(frames, encoder)
+        async for encoded_frame in encoded_frames:
+            yield encoded_frame
+
     async def _stream_events( # pylint: disable=too-many-locals
             self,
             *,
@@ -247,8 +344,18 @@ class LangGraphAgent(Agent):
         emit_intermediate_state_until_end = None
         should_exit = False
         thread_id = cast(Any, config)["configurable"]["thread_id"]
+        state_tracker = _CheckpointStateTracker(
+            self.graph,
+            config,
+            mode=self.state_tracking
+        )
 
-        async for event in self.graph.astream_events(initial_state, config, version="v1"):
+        # copilotkit_emit_* functions called by the nodes emit through the channel
+        events = EmissionChannel().merge(
+            self.graph.astream_events(initial_state, config, version="v1")
+        )
+
+        async for event in events:
             current_node_name = event.get("name")
             event_type = event.get("event")
             run_id = event.get("run_id")
@@ -282,31 +389,27 @@ class LangGraphAgent(Agent):
                         state=state,
                         running=True,
                         active=True
-                    ) + "\n"
+                    )
                 continue
 
             if manually_emit_message:
                 if event_type == "on_chain_end":
-                    yield json.dumps(
-                        {
-                            "event": "on_copilotkit_emit_message",
-                            "message": cast(Any, event["data"])["output"],
-                            "message_id": str(uuid.uuid4()),
-                            "role": "assistant"
-                        }
-                    ) + "\n"
+                    yield {
+                        "event": "on_copilotkit_emit_message",
+                        "message": cast(Any, event["data"])["output"],
+                        "message_id": str(uuid.uuid4()),
+                        "role": "assistant"
+                    }
                 continue
 
             if manually_emit_tool_call:
                 if event_type == "on_chain_end":
-                    yield json.dumps(
-                        {
-                            "event": "on_copilotkit_emit_tool_call",
-                            "name": cast(Any, event["data"])["output"]["name"],
-                            "args": cast(Any, event["data"])["output"]["args"],
-                            "id": cast(Any, event["data"])["output"]["id"]
-                        }
-                    ) + "\n"
+                    yield {
+                        "event": "on_copilotkit_emit_tool_call",
+                        "name": cast(Any, event["data"])["output"]["name"],
+                        "args": cast(Any, event["data"])["output"]["args"],
+                        "id": cast(Any, event["data"])["output"]["id"]
+                    }
                 continue
 
             if emit_intermediate_state and emit_intermediate_state_until_end is None:
@@ -316,7 +419,7 @@ class LangGraphAgent(Agent):
                 # reset the streaming state extractor
                 streaming_state_extractor = _StreamingStateExtractor(emit_intermediate_state)
 
-            updated_state = self.graph.get_state(config).values
+            updated_state = await state_tracker.get_state(event)
 
             if emit_intermediate_state and event_type == "on_chat_model_stream":
                 streaming_state_extractor.buffer_tool_calls(event)
@@ -347,11 +450,11 @@ class LangGraphAgent(Agent):
                     state=state,
                     running=True,
                     active=not exiting_node
-                ) + "\n"
+                )
 
-            yield langchain_dumps(event) + "\n"
+            yield event
 
-        state = self.graph.get_state(config)
+        state = await self.graph.aget_state(config)
         is_end_node = state.next == ()
 
         node_name = list(state.metadata["writes"].keys())[0]
@@ -364,7 +467,7 @@ class LangGraphAgent(Agent):
             running=not should_exit,
             # at this point, the node is ending so we set active to false
             active=False
-        ) + "\n"
+        )
 
 
 
@@ -375,10 +478,68 @@ class LangGraphAgent(Agent):
             'type': 'langgraph'
         }
 
+async def _encode_frames(
+        frames: AsyncIterator[Frame],
+        encoder: FrameEncoder
+    ) -> AsyncIterator[bytes]:
+    """Encode frames as newline delimited JSON"""
+    async for frame in frames:
+        yield encoder.encode(frame)
+
+async def _encode_msgpack_frames(
+        frames: AsyncIterator[Frame],
+        encoder: FrameEncoder
+    ) -> AsyncIterator[bytes]:
+    """Encode frames as length-prefixed MessagePack records"""
+    async for frame in frames:
+        yield pack_frame(frame, encoder)
+
+class _CheckpointStateTracker:
+    """
+    Tracks the graph state while streaming events.
+
+    Reading the state from the checkpointer on every event is expensive (every token
+    would hit the database), so in "checkpoint" mode the state is only read on events
+    that may follow a checkpoint write (graph and node boundaries). The cached values
+    are reused as long as the checkpoint id does not change.
+    """
+    def __init__(self, graph: CompiledGraph, config: RunnableConfig, *, mode: str):
+        self.graph = graph
+        self.config = config
+        self.mode = mode
+        self.boundary_names = set(graph.nodes.keys()) | {graph.get_name()}
+        self.checkpoint_id = None
+        self.values = None
+
+    def is_checkpoint_boundary(self, event: Any) -> bool:
+        """Check if a checkpoint may have been written before this event"""
+        return (
+            event.get("event") in ("on_chain_start", "on_chain_stream", "on_chain_end") and
+            event.get("name") in self.boundary_names
+        )
+
+    async def get_state(self, event: Any) -> dict:
+        """Get the current state values"""
+        if (self.values is not None and
+            self.mode == "checkpoint" and
+            not self.is_checkpoint_boundary(event)):
+            return self.values
+
+        snapshot = await self.graph.aget_state(self.config)
+        checkpoint_id = (snapshot.config or {}).get("configurable", {}).get("checkpoint_id")
+
+        # keep the cached values if the checkpoint did not change, so that comparing
+        # them with the last emitted state stays cheap
+        if self.values is None or checkpoint_id is None or checkpoint_id != self.checkpoint_id:
+            self.values = snapshot.values
+            self.checkpoint_id = checkpoint_id
+
+        return self.values
+
 class _StreamingStateExtractor:
     def __init__(self, emit_intermediate_state: List[dict]):
         self.emit_intermediate_state = emit_intermediate_state
-        self.tool_call_buffer = {}
+        self.tool_call_parsers = {}
         self.current_tool_call = None
 
         self.previously_parsable_state = {}
@@ -389,11 +550,9 @@ class _StreamingStateExtractor:
             chunk = event["data"]["chunk"].tool_call_chunks[0]
             if chunk["name"] is not None:
                 self.current_tool_call = chunk["name"]
-                self.tool_call_buffer[self.current_tool_call] = chunk["args"]
-            elif self.current_tool_call is not None:
-                self.tool_call_buffer[self.current_tool_call] = (
-                    self.tool_call_buffer[self.current_tool_call] + chunk["args"]
-                )
+                self.tool_call_parsers[self.current_tool_call] = IncrementalJSONParser()
+            if self.current_tool_call is not None and chunk["args"]:
+                self.tool_call_parsers[self.current_tool_call].feed(chunk["args"])
 
     def get_emit_state_config(self, current_tool_name):
         """Get the emit state config"""
@@ -411,19 +570,17 @@ class _StreamingStateExtractor:
 
     def extract_state(self):
         """Extract the streaming state"""
-        parser = JSONParser()
-
         state = {}
 
-        for key, value in self.tool_call_buffer.items():
+        for key, parser in self.tool_call_parsers.items():
             argument_name, state_key = self.get_emit_state_config(key)
 
             if state_key is None:
                 continue
 
             try:
-                parsed_value = parser.parse(value)
-            except Exception as _exc: # pylint: disable=broad-except
+                parsed_value = parser.value()
+            except ValueError:
                 if key in self.previously_parsable_state:
                     parsed_value = self.previously_parsable_state[key]
                 else:
@@ -0,0 +1,113 @@
+"""
+Length-prefixed MessagePack framing for agent event streams.
+
+Each frame is a record of a 4 byte big-endian length followed by that many
+bytes of MessagePack. Frames have the same schema as the JSON lines of the
+default framing, except that non-string keys are not converted to strings.
+Needs `ormsgpack` or `msgpack` to be installed, e.g. with the `msgpack` extra.
+"""
+
+import struct
+from typing import Any, Callable, Iterable, Iterator, List, Optional
+from .serializer import FrameEncoder
+
+try:
+    import ormsgpack
+except ImportError: # pragma: no cover
+    ormsgpack = None # type: ignore
+
+try:
+    import msgpack
+except ImportError: # pragma: no cover
+    msgpack = None # type: ignore
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+_LENGTH = struct.Struct(">I")
+
+_NOT_INSTALLED = "MessagePack framing needs ormsgpack or msgpack to be installed"
+
+def msgpack_available() -> bool:
+    """Whether a MessagePack library is installed"""
+    return ormsgpack is not None or msgpack is not None
+
+def _packb(value: Any, default: Callable[[Any], Any]) -> bytes:
+    if ormsgpack is not None:
+        return ormsgpack.packb(value, default=default, option=ormsgpack.OPT_NON_STR_KEYS)
+    if msgpack is not None:
+        return msgpack.packb(value, default=default, use_bin_type=True)
+    raise RuntimeError(_NOT_INSTALLED)
+
+def _unpackb(data: bytes) -> Any:
+    if ormsgpack is not None:
+        return ormsgpack.unpackb(data, option=ormsgpack.OPT_NON_STR_KEYS)
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    raise RuntimeError(_NOT_INSTALLED)
+
+_ENCODER = FrameEncoder()
+
+def pack_frame(frame: Any, encoder: Optional[FrameEncoder] = None) -> bytes:
+    """
+    Encode a frame as a length-prefixed MessagePack record. LangChain objects
+    are serialized by the encoder, the same way as in the JSON framing.
+    """
+    data = _packb(frame, (encoder or _ENCODER).default)
+    return _LENGTH.pack(len(data)) + data
+
+class FrameDecoder:
+    """
+    Reference decoder for length-prefixed MessagePack streams.
+
+    Feed it the chunks of a stream as they arrive, in any size, and it returns
+    the frames that are complete.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> List[Any]:
+        """Add a chunk, returning the decoded frames that are complete"""
+        self._buffer += chunk
+        frames = []
+        offset = 0
+        while len(self._buffer) - offset >= _LENGTH.size:
+            (length,) = _LENGTH.unpack_from(self._buffer, offset)
+            end = offset + _LENGTH.size + length
+            if end > len(self._buffer):
+                break
+            frames.append(_unpackb(bytes(self._buffer[offset + _LENGTH.size:end])))
+            offset = end
+        del self._buffer[:offset]
+        return frames
+
+    @property
+    def pending(self) -> int:
+        """Number of buffered bytes of an incomplete frame"""
+        return len(self._buffer)
+
+def decode_frames(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Decode a length-prefixed MessagePack stream"""
+    decoder = FrameDecoder()
+    for chunk in chunks:
+        yield from decoder.feed(chunk)
+    if decoder.pending:
+        raise ValueError("Stream ended in the middle of a frame")
+
+def accepts_msgpack(accept: Optional[str]) -> bool:
+    """Whether an Accept header asks for MessagePack framing and it's available"""
+    if not accept or not msgpack_available():
+        return False
+    for item in accept.split(","):
+        media_type, *parameters = [part.strip() for part in item.split(";")]
+        if media_type.lower() != MSGPACK_MEDIA_TYPE:
+            continue
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
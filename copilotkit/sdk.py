@@ -1,17 +1,49 @@
 """CopilotKit SDK"""
 
+import json
+import asyncio
+import logging
+import hashlib
 from pprint import pformat
-from typing import List, Callable, Union, Optional, TypedDict, Any, Coroutine
+from inspect import iscoroutinefunction
+from typing import (
+    List,
+    Callable,
+    Union,
+    Optional,
+    TypedDict,
+    Any,
+    Coroutine,
+    Dict,
+    Tuple,
+    AsyncIterator,
+    Awaitable,
+    cast
+)
 from .agent import Agent, AgentDict
-from .action import Action, ActionDict, ActionResultDict
-from .types import Message
+from .action import (
+    Action,
+    ActionDict,
+    ActionResultDict,
+    ActionCallDict,
+    ActionBatchResultDict,
+    ActionStreamFrameDict
+)
+from .types import Message, StreamOptions
 from .exc import (
     ActionNotFoundException,
+    ActionArgumentsException,
+    ActionOverloadedException,
+    ActionTimeoutException,
     AgentNotFoundException,
     ActionExecutionException,
-    AgentExecutionException
+    AgentExecutionException,
+    BlobNotFoundException
 )
 from .logging import get_logger, bold
+from .cache import LRUCache, fingerprint
+from .executor import ActionExecutor
+from .blob_store import BlobStore
 
 
 COPILOTKIT_SDK_VERSION = "0.1.22"
@@ -29,6 +61,15 @@ class CopilotKitSDKContext(TypedDict):
     properties: Any
     frontend_url: Optional[str]
 
+Catalog = Tuple[List[Any], Dict[str, Any]]
+
+def _make_catalog(items: List[Any]) -> Catalog:
+    """Index items by name, the first item with a name wins"""
+    index = {}
+    for item in items:
+        index.setdefault(item.name, item)
+    return items, index
+
 class CopilotKitSDK:
     """CopilotKit SDK"""
 
@@ -47,10 +88,72 @@ class CopilotKitSDK:
                 Callable[[CopilotKitSDKContext], List[Agent]]
             ]
         ] = None,
+        dynamic_cache_size: int = 0,
+        dynamic_cache_ttl: Optional[float] = None,
+        action_executor: Optional[ActionExecutor] = None,
+        max_batch_concurrency: int = 8,
+        blob_store: Optional[BlobStore] = None,
     ):
         self.agents = agents or []
         self.actions = actions or []
 
+        # runs synchronous action handlers, unless the action has its own executor
+        self.action_executor = action_executor or ActionExecutor()
+        if isinstance(self.actions, list):
+            for action in self.actions:
+                if (action.executor is None and
+                    not action.streaming and
+                    not iscoroutinefunction(action.handler)):
+                    self.action_executor.check_handler(action.name, action.handler)
+        # how many actions of a batch are executed concurrently
+        self.max_batch_concurrency = max_batch_concurrency
+        # if set, large action results are stored here and replaced by references
+        self.blob_store = blob_store
+
+        # if dynamic_cache_size is set, the results of callable actions and agents
+        # are cached per context (properties and frontend URL) for up to
+        # dynamic_cache_ttl seconds
+        self._dynamic_cache: Optional[LRUCache[Catalog]] = (
+            LRUCache(max_entries=dynamic_cache_size, ttl=dynamic_cache_ttl)
+            if dynamic_cache_size > 0
+            else None
+        )
+        self._static_catalogs: Dict[str, Catalog] = {}
+        self._info_cache: LRUCache[Tuple[bytes, str]] = LRUCache(
+            max_entries=max(dynamic_cache_size, 1),
+            ttl=dynamic_cache_ttl
+        )
+
+    def invalidate_cache(self):
+        """
+        Invalidate the cached actions and agents, e.g. after changing self.actions
+        or self.agents or when callable actions or agents return different results
+        """
+        self._static_catalogs.clear()
+        self._info_cache.clear()
+        if self._dynamic_cache is not None:
+            self._dynamic_cache.clear()
+
+    def _get_catalog(self, kind: str, context: CopilotKitSDKContext) -> Catalog:
+        """Get the actions or agents (kind) for a context, indexed by name"""
+        items = getattr(self, kind)
+
+        if not callable(items):
+            catalog = self._static_catalogs.get(kind)
+            if catalog is None:
+                catalog = self._static_catalogs[kind] = _make_catalog(items)
+            return catalog
+
+        if self._dynamic_cache is None:
+            return _make_catalog(items(context))
+
+        key = kind + ":" + fingerprint(context)
+        catalog = self._dynamic_cache.get(key)
+        if catalog is None:
+            catalog = _make_catalog(items(context))
+            self._dynamic_cache.set(key, catalog)
+        return catalog
+
     def info(
         self,
         *,
@@ -58,21 +161,22 @@ class CopilotKitSDK:
     ) -> InfoDict:
         """Returns information about available actions and agents"""
 
-        actions = self.actions(context) if callable(self.actions) else self.actions
-        agents = self.agents(context) if callable(self.agents) else self.agents
+        actions, _ = self._get_catalog("actions", context)
+        agents, _ = self._get_catalog("agents", context)
 
         actions_list = [action.dict_repr() for action in actions]
         agents_list = [agent.dict_repr() for agent in agents]
 
-        logger.debug(bold("Handling info request:"))
-        logger.debug("--------------------------")
-        logger.debug(bold("Context:"))
-        logger.debug(pformat(context))
-        logger.debug(bold("Actions:"))
-        logger.debug(pformat(actions_list))
-        logger.debug(bold("Agents:"))
-        logger.debug(pformat(agents_list))
-        logger.debug("--------------------------")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(bold("Handling info request:"))
+            logger.debug("--------------------------")
+            logger.debug(bold("Context:"))
+            logger.debug(pformat(context))
+            logger.debug(bold("Actions:"))
+            logger.debug(pformat(actions_list))
+            logger.debug(bold("Agents:"))
+            logger.debug(pformat(agents_list))
+            logger.debug("--------------------------")
 
         return {
             "actions": actions_list,
@@ -80,6 +184,40 @@ class CopilotKitSDK:
             "sdkVersion": COPILOTKIT_SDK_VERSION
         }
 
+    def info_json(
+        self,
+        *,
+        context: CopilotKitSDKContext
+    ) -> Tuple[bytes, str]:
+        """
+        Returns the info response encoded as JSON, together with its ETag.
+
+        The encoded response is cached as long as the actions and agents are,
+        i.e. for static lists until invalidate_cache() is called and for
+        callables if dynamic caching is enabled.
+        """
+        if not callable(self.actions) and not callable(self.agents):
+            key: Optional[str] = "static"
+        elif self._dynamic_cache is not None:
+            key = fingerprint(context)
+        else:
+            key = None
+
+        cached = self._info_cache.get(key) if key is not None else None
+        if cached is not None:
+            return cached
+
+        body = json.dumps(
+            self.info(context=context),
+            ensure_ascii=False,
+            separators=(",", ":")
+        ).encode("utf-8")
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+        if key is not None:
+            self._info_cache.set(key, (body, etag))
+        return body, etag
+
     def _get_action(
         self,
         *,
@@ -87,23 +225,19 @@ class CopilotKitSDK:
         name: str,
     ) -> Action:
         """Get an action by name"""
-        actions = self.actions(context) if callable(self.actions) else self.actions
-        action = next((action for action in actions if action.name == name), None)
+        _, actions = self._get_catalog("actions", context)
+        action = actions.get(name)
         if action is None:
             raise ActionNotFoundException(name)
         return action
 
-    def execute_action(
+    def _log_action_request(
             self,
             *,
             context: CopilotKitSDKContext,
-            name: str,
-            arguments: dict,
-    ) -> Coroutine[Any, Any, ActionResultDict]:
-        """Execute an action"""
-
-        action = self._get_action(context=context, name=name)
-
+            action: Action,
+            arguments: dict
+        ):
         logger.info(bold("Handling execute action request:"))
         logger.info("--------------------------")
         logger.info(bold("Context:"))
@@ -114,12 +248,180 @@ class CopilotKitSDK:
         logger.info(pformat(arguments))
         logger.info("--------------------------")
 
+    def execute_action(
+            self,
+            *,
+            context: CopilotKitSDKContext,
+            name: str,
+            arguments: dict,
+    ) -> Coroutine[Any, Any, ActionResultDict]:
+        """Execute an action"""
+
+        action = self._get_action(context=context, name=name)
+        self._log_action_request(context=context, action=action, arguments=arguments)
+
         try:
-            result = action.execute(arguments=arguments)
+            result = action.execute(
+                arguments=arguments,
+                default_executor=self.action_executor,
+                properties=context.get("properties")
+            )
+            if self.blob_store is not None:
+                return self._offload_result(result)
             return result
         except Exception as error:
             raise ActionExecutionException(name, error) from error
 
+    async def _offload_result(
+            self,
+            result: Awaitable[ActionResultDict]
+        ) -> ActionResultDict:
+        blob_store = cast(BlobStore, self.blob_store)
+        return {
+            "result": await asyncio.to_thread(blob_store.offload, (await result)["result"])
+        }
+
+    def stream_action(
+            self,
+            *,
+            context: CopilotKitSDKContext,
+            name: str,
+            arguments: dict,
+    ) -> AsyncIterator[ActionStreamFrameDict]:
+        """Execute an action, streaming its partial results, see `Action.stream`"""
+
+        action = self._get_action(context=context, name=name)
+        self._log_action_request(context=context, action=action, arguments=arguments)
+
+        frames = action.stream(
+            arguments=arguments,
+            default_executor=self.action_executor,
+            properties=context.get("properties")
+        )
+        if self.blob_store is not None:
+            return self._offload_stream_result(frames)
+        return frames
+
+    async def _offload_stream_result(
+            self,
+            frames: AsyncIterator[ActionStreamFrameDict]
+        ) -> AsyncIterator[ActionStreamFrameDict]:
+        blob_store = cast(BlobStore, self.blob_store)
+        async for frame in frames:
+            if "result" in frame:
+                frame = {"result": await asyncio.to_thread(blob_store.offload, frame["result"])}
+            yield frame
+
+    def read_blob(
+            self,
+            *,
+            blob_id: str,
+            offset: int = 0,
+            length: Optional[int] = None
+        ) -> Tuple[bytes, int]:
+        """Read a range of an offloaded action result, returning the data and the total size"""
+        if self.blob_store is None:
+            raise BlobNotFoundException(blob_id)
+        return (
+            self.blob_store.read(blob_id, offset, length),
+            self.blob_store.size(blob_id)
+        )
+
+    async def _execute_batch_item(
+            self,
+            *,
+            context: CopilotKitSDKContext,
+            index: int,
+            call: ActionCallDict,
+            semaphore: asyncio.Semaphore
+        ) -> ActionBatchResultDict:
+        item: ActionBatchResultDict = {"index": index, "name": call["name"], "status": 200}
+        if "id" in call:
+            item["id"] = call["id"]
+
+        async with semaphore:
+            try:
+                result = await self.execute_action(
+                    context=context,
+                    name=call["name"],
+                    arguments=call.get("arguments", {})
+                )
+                item["result"] = result["result"]
+            except ActionNotFoundException as exc:
+                item["status"] = 404
+                item["error"] = str(exc)
+            except ActionArgumentsException as exc:
+                item["status"] = 400
+                item["error"] = str(exc)
+                item["errors"] = exc.errors
+            except ActionOverloadedException as exc:
+                item["status"] = 503
+                item["error"] = str(exc)
+            except ActionTimeoutException as exc:
+                item["status"] = 504
+                item["error"] = str(exc)
+            except Exception as exc: # pylint: disable=broad-except
+                logger.error("Action execution error: %s", exc)
+                item["status"] = 500
+                item["error"] = str(exc)
+
+        return item
+
+    async def stream_actions(
+            self,
+            *,
+            context: CopilotKitSDKContext,
+            calls: List[ActionCallDict],
+            max_concurrency: Optional[int] = None,
+    ) -> AsyncIterator[ActionBatchResultDict]:
+        """
+        Execute a batch of actions concurrently, yielding the result of each
+        action as it completes. Errors are reported per action.
+        """
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_batch_concurrency)
+        tasks = [
+            asyncio.ensure_future(
+                self._execute_batch_item(
+                    context=context,
+                    index=index,
+                    call=call,
+                    semaphore=semaphore
+                )
+            )
+            for index, call in enumerate(calls)
+        ]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def execute_actions(
+            self,
+            *,
+            context: CopilotKitSDKContext,
+            calls: List[ActionCallDict],
+            max_concurrency: Optional[int] = None,
+    ) -> List[ActionBatchResultDict]:
+        """Execute a batch of actions concurrently, returning the results in order"""
+        results = [
+            result async for result in self.stream_actions(
+                context=context,
+                calls=calls,
+                max_concurrency=max_concurrency
+            )
+        ]
+        return sorted(results, key=lambda result: result["index"])
+
+    def get_agent(self, *, context: CopilotKitSDKContext, name: str) -> Agent:
+        """Get an agent by name"""
+        _, agents = self._get_catalog("agents", context)
+        agent = agents.get(name)
+        if agent is None:
+            raise AgentNotFoundException(name)
+        return agent
+
     def execute_agent( # pylint: disable=too-many-arguments
         self,
         *,
@@ -130,12 +432,11 @@ class CopilotKitSDK:
         state: dict,
         messages: List[Message],
         actions: List[ActionDict],
+        stream_options: Optional[StreamOptions] = None,
+        last_message_id: Optional[str] = None,
     ) -> Any:
         """Execute an agent"""
-        agents = self.agents(context) if callable(self.agents) else self.agents
-        agent = next((agent for agent in agents if agent.name == name), None)
-        if agent is None:
-            raise AgentNotFoundException(name)
+        agent = self.get_agent(context=context, name=name)
 
         logger.info(bold("Handling execute agent request:"))
         logger.info("--------------------------")
@@ -147,14 +448,28 @@ class CopilotKitSDK:
         logger.info(thread_id)
         logger.info(bold("Node Name:"))
         logger.info(node_name)
+        logger.info(bold("Last Message ID:"))
+        logger.info(last_message_id)
         logger.info(bold("State:"))
         logger.info(pformat(state))
         logger.info(bold("Messages:"))
         logger.info(pformat(messages))
         logger.info(bold("Actions:"))
         logger.info(pformat(actions))
+        logger.info(bold("Stream Options:"))
+        logger.info(pformat(stream_options))
         logger.info("--------------------------")
 
+        # only pass the arguments added after the first version of Agent.execute
+        # when they are set, and the agent takes them
+        optional_arguments = {
+            argument: value for argument, value in (
+                ("stream_options", stream_options),
+                ("last_message_id", last_message_id),
+                ("blob_store", self.blob_store),
+            )
+            if value is not None and agent.accepts_execute_argument(argument)
+        }
         try:
             return agent.execute(
                 thread_id=thread_id,
@@ -162,6 +477,7 @@ class CopilotKitSDK:
                 state=state,
                 messages=messages,
                 actions=actions,
+                **optional_arguments
             )
         except Exception as error:
             raise AgentExecutionException(name, error) from error
@@ -0,0 +1,115 @@
+"""
+Fast encoder for agent event stream frames.
+
+Frames are encoded with orjson when it's installed, LangChain objects are
+dispatched by type instead of going through `langchain_dumps` for every frame.
+"""
+
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+from langchain_core.load.serializable import Serializable, to_json_not_implemented
+from langchain_core.messages import BaseMessage
+from .stream import Frame, STATE_SYNC_EVENT
+
+try:
+    import orjson
+except ImportError: # pragma: no cover
+    orjson = None # type: ignore
+
+def _encode_lc(obj: Any) -> Any:
+    return obj.to_json()
+
+# message fields of the compact schema, empty values are left out
+_COMPACT_MESSAGE_FIELDS = (
+    "id",
+    "name",
+    "content",
+    "tool_calls",
+    "tool_call_chunks",
+    "invalid_tool_calls",
+    "tool_call_id",
+    "additional_kwargs",
+)
+
+def _encode_compact_message(message: Any) -> Any:
+    encoded = {"type": message.type}
+    for field in _COMPACT_MESSAGE_FIELDS:
+        value = getattr(message, field, None)
+        if value or value == 0:
+            encoded[field] = value
+    if "content" not in encoded:
+        encoded["content"] = ""
+    return encoded
+
+class FrameEncoder:
+    """
+    Encodes frames as JSON lines.
+
+    LangChain objects are encoded like `langchain_dumps` does, or with
+    `compact_messages`, messages and message chunks are encoded as
+    `{"type", "id", "content", ...}` with only the fields that are set.
+
+    For state syncs, the encoded value of each top level state key is cached
+    and reused as long as the state holds the same object, so values that are
+    carried over between syncs, like checkpoint values, are not encoded again.
+    Values are not compared by equality, since an equal value may be an object
+    that was mutated in place after it was encoded. Frames must not be mutated
+    after they are encoded.
+    """
+
+    def __init__(self, *, compact_messages: bool = False):
+        self.compact_messages = compact_messages
+        # encoder by type, resolved on first use
+        self._dispatch: Dict[type, Callable[[Any], Any]] = {}
+        # state key -> (value, encoded value)
+        self._state_cache: Dict[str, Tuple[Any, bytes]] = {}
+
+    def default(self, obj: Any) -> Any:
+        """Encode an object the serializer doesn't support natively"""
+        encode = self._dispatch.get(type(obj))
+        if encode is None:
+            if self.compact_messages and isinstance(obj, BaseMessage):
+                encode = _encode_compact_message
+            elif isinstance(obj, Serializable):
+                encode = _encode_lc
+            else:
+                encode = to_json_not_implemented
+            self._dispatch[type(obj)] = encode
+        return encode(obj)
+
+    def dumps(self, value: Any) -> bytes:
+        """Encode a value as JSON"""
+        if orjson is not None:
+            try:
+                return orjson.dumps(value, default=self.default, option=orjson.OPT_NON_STR_KEYS)
+            except TypeError:
+                # e.g. integers larger than 64 bit, which the json module supports
+                pass
+        return json.dumps(value, default=self.default).encode("utf-8")
+
+    def _encode_state(self, state: Dict[str, Any]) -> bytes:
+        cache = self._state_cache
+        self._state_cache = {}
+        items = []
+        for key, value in state.items():
+            cached: Optional[Tuple[Any, bytes]] = cache.get(key)
+            if cached is not None and cached[0] is value:
+                encoded = cached[1]
+            else:
+                encoded = self.dumps(value)
+            self._state_cache[key] = (value, encoded)
+            items.append(self.dumps(key) + b":" + encoded)
+        return b"{" + b",".join(items) + b"}"
+
+    def encode(self, frame: Frame) -> bytes:
+        """Encode a frame as a JSON line"""
+        state = frame.get("state")
+        if (frame.get("event") != STATE_SYNC_EVENT or
+            not isinstance(state, dict) or
+            not all(isinstance(key, str) for key in state)):
+            return self.dumps(frame) + b"\n"
+
+        # splice the state into the rest of the frame
+        rest = self.dumps({k: v for k, v in frame.items() if k != "state"})
+        separator = b"," if len(rest) > 2 else b""
+        return rest[:-1] + separator + b'"state":' + self._encode_state(state) + b"}\n"
@@ -0,0 +1,501 @@
+"""
+Stages for agent event streams.
+
+Agents produce a stream of event dicts, these stages transform the stream
+before it is encoded and sent to the client.
+"""
+
+import json
+import asyncio
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+from .json_patch import make_patch, snapshot
+
+Frame = Dict[str, Any]
+
+STATE_SYNC_EVENT = "on_copilotkit_state_sync"
+
+async def delta_state_syncs(
+        frames: AsyncIterator[Frame],
+        *,
+        snapshot_interval: int = 100
+    ) -> AsyncIterator[Frame]:
+    """
+    Replace the full state of state sync events with a patch against the state
+    sent last, see `json_patch.make_patch`.
+
+    Delta frames carry a "delta" list of patch operations instead of "state".
+    The first state sync and every `snapshot_interval`-th state sync after it are
+    sent in full so that clients can resync.
+
+    Patches are made against a snapshot of the state sent last, since states may
+    share objects that were mutated in place in the meantime.
+    """
+    last_state: Optional[Any] = None
+    syncs_since_snapshot = 0
+
+    async for frame in frames:
+        if frame.get("event") != STATE_SYNC_EVENT:
+            yield frame
+            continue
+
+        state = frame["state"]
+
+        if last_state is None or syncs_since_snapshot >= snapshot_interval:
+            syncs_since_snapshot = 0
+            last_state = snapshot(state)
+            yield frame
+            continue
+
+        syncs_since_snapshot += 1
+        delta = make_patch(last_state, state)
+        last_state = snapshot(state)
+
+        yield {
+            **{k: v for k, v in frame.items() if k != "state"},
+            "delta": delta
+        }
+
+# frames that may be sent ahead of a pending state sync
+_TOKEN_EVENTS = {
+    "on_chat_model_stream",
+    "on_copilotkit_text_delta",
+    "on_copilotkit_tool_call_delta",
+}
+
+async def coalesce_state_syncs( # pylint: disable=too-many-statements
+        frames: AsyncIterator[Frame],
+        *,
+        min_interval: float = 0.05,
+        max_buffered_frames: int = 1000
+    ) -> AsyncIterator[Frame]:
+    """
+    Decouple producing frames from sending them to the client.
+
+    The frames are consumed in a background task, so the graph keeps running while
+    the client reads slowly. State syncs are coalesced while tokens stream: only
+    the latest pending state sync is kept and state syncs are sent at most every
+    `min_interval` seconds. Any other frame, e.g. an emitted message or a state
+    sync of a node that finished (active is False), first sends the pending state
+    sync, so these stay in order. The only reordering is that token frames may be
+    sent ahead of a pending state sync that came before them. All frames but
+    coalesced state syncs are buffered and never dropped; only if more than
+    `max_buffered_frames` of them are waiting, the producer waits for the client.
+
+    This stage needs to run before `delta_state_syncs`, since deltas can't be
+    coalesced.
+    """
+    loop = asyncio.get_running_loop()
+    buffered: Deque[Tuple[int, Frame]] = deque()
+    pending_state_sync: Optional[Tuple[int, Frame]] = None
+    done = False
+    error: Optional[Exception] = None
+    changed = asyncio.Event()
+    space_available = asyncio.Event()
+
+    async def produce():
+        nonlocal pending_state_sync, done, error
+        sequence = 0
+        try:
+            async for frame in frames:
+                sequence += 1
+                event = frame.get("event")
+                if event == STATE_SYNC_EVENT and frame.get("active") is not False:
+                    pending_state_sync = (sequence, frame)
+                else:
+                    while len(buffered) >= max_buffered_frames:
+                        space_available.clear()
+                        await space_available.wait()
+                    if event == STATE_SYNC_EVENT:
+                        # supersedes the pending state sync
+                        pending_state_sync = None
+                    elif pending_state_sync is not None and event not in _TOKEN_EVENTS:
+                        buffered.append(pending_state_sync)
+                        pending_state_sync = None
+                    buffered.append((sequence, frame))
+                changed.set()
+        except Exception as exc: # pylint: disable=broad-except
+            error = exc
+        finally:
+            done = True
+            changed.set()
+
+    producer = asyncio.create_task(produce())
+    last_state_sync_time = float("-inf")
+
+    try:
+        while True:
+            now = loop.time()
+
+            # send the state sync once it's due and all frames before it are sent
+            if (pending_state_sync is not None and
+                (done or now - last_state_sync_time >= min_interval) and
+                (not buffered or buffered[0][0] > pending_state_sync[0])):
+                frame = pending_state_sync[1]
+                pending_state_sync = None
+                last_state_sync_time = now
+                yield frame
+                continue
+
+            if buffered:
+                _, frame = buffered.popleft()
+                space_available.set()
+                if frame.get("event") == STATE_SYNC_EVENT:
+                    last_state_sync_time = now
+                yield frame
+                continue
+
+            if done and pending_state_sync is None:
+                break
+
+            changed.clear()
+            timeout = (
+                None if pending_state_sync is None
+                else max(0.0, last_state_sync_time + min_interval - now)
+            )
+            try:
+                await asyncio.wait_for(changed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        if error is not None:
+            raise error
+    finally:
+        producer.cancel()
+
+# raw LangGraph events that are used by the frontend
+_FORWARDED_EVENTS = {
+    "on_chat_model_start",
+    "on_chat_model_stream",
+    "on_chat_model_end",
+    "on_custom_event",
+}
+
+def _is_tool_call_emitted(policy: Any, name: Optional[str]) -> bool:
+    if policy is None or policy is True:
+        return True
+    if policy is False:
+        return False
+    if isinstance(policy, str):
+        return name == policy
+    return name in policy
+
+def _chunk_text(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    # content blocks, e.g. from Anthropic models
+    return "".join(
+        block.get("text", "") for block in content or []
+        if isinstance(block, dict) and block.get("type") == "text"
+    )
+
+class _ChatModelStreamFilter:
+    """
+    Applies the `copilotkit:emit-messages` and `copilotkit:emit-tool-calls` policies
+    to chat model chunks.
+    """
+    def __init__(self):
+        # tool call (id, name) by (run id, tool call index), both are only sent with the first chunk
+        self.tool_calls: Dict[Tuple[Any, Any], Tuple[Optional[str], Optional[str]]] = {}
+
+    def filter(self, event: Frame) -> Tuple[str, List[Dict[str, Any]]]:
+        """Get the emitted text and tool call chunks of an on_chat_model_stream event"""
+        metadata = event.get("metadata") or {}
+        emit_messages = metadata.get("copilotkit:emit-messages", True) is not False
+        emit_tool_calls = metadata.get("copilotkit:emit-tool-calls", True)
+        chunk = (event.get("data") or {}).get("chunk")
+
+        text = _chunk_text(getattr(chunk, "content", None)) if emit_messages else ""
+        tool_call_chunks = []
+
+        for tool_call_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+            key = (event.get("run_id"), tool_call_chunk.get("index"))
+            if tool_call_chunk.get("name") is not None:
+                self.tool_calls[key] = (tool_call_chunk.get("id"), tool_call_chunk["name"])
+            tool_call_id, name = self.tool_calls.get(key, (None, None))
+            if _is_tool_call_emitted(emit_tool_calls, name):
+                tool_call_chunks.append({
+                    **tool_call_chunk,
+                    "id": tool_call_chunk.get("id") or tool_call_id,
+                })
+
+        return text, tool_call_chunks
+
+    def end_run(self, run_id: Any):
+        """Forget the tool calls of a finished chat model run"""
+        for key in [key for key in self.tool_calls if key[0] == run_id]:
+            del self.tool_calls[key]
+
+def _trim_event(event: Frame) -> Frame:
+    """Trim an event to what the frontend needs"""
+    data = event.get("data") or {}
+    metadata = event.get("metadata") or {}
+    return {
+        **event,
+        "data": {k: v for k, v in data.items() if k != "input"},
+        "metadata": {
+            k: v for k, v in metadata.items()
+            if k.startswith("copilotkit:") or k.startswith("langgraph_")
+        },
+    }
+
+async def enforce_emit_policies(frames: AsyncIterator[Frame]) -> AsyncIterator[Frame]:
+    """
+    Apply the `copilotkit:emit-messages` and `copilotkit:emit-tool-calls`
+    policies on the server.
+
+    Raw events that the frontend ignores are dropped: chain, tool and retriever
+    events, and chat model chunks without emitted messages or tool calls.
+    The remaining raw events are trimmed to the data the frontend uses before
+    they are serialized. CopilotKit events are passed through unchanged.
+    """
+    stream_filter = _ChatModelStreamFilter()
+
+    async for frame in frames:
+        event_type = frame.get("event", "")
+
+        if event_type.startswith("on_copilotkit_"):
+            yield frame
+            continue
+
+        if event_type not in _FORWARDED_EVENTS:
+            continue
+
+        if event_type == "on_chat_model_stream":
+            text, tool_call_chunks = stream_filter.filter(frame)
+            if not text and not tool_call_chunks:
+                continue
+        elif event_type == "on_chat_model_end":
+            stream_filter.end_run(frame.get("run_id"))
+
+        yield _trim_event(frame)
+
+async def compact_chat_model_streams(frames: AsyncIterator[Frame]) -> AsyncIterator[Frame]:
+    """
+    Replace on_chat_model_stream events with compact delta events.
+
+    Text is sent as `{"event": "on_copilotkit_text_delta", "message_id", "delta"}`
+    and tool call arguments as
+    `{"event": "on_copilotkit_tool_call_delta", "tool_call_id", "args_delta"}`,
+    the first delta of a tool call also carries its "name" and "message_id".
+    Since the compact events don't carry metadata, the emit policies are
+    applied on the server.
+    """
+    stream_filter = _ChatModelStreamFilter()
+
+    async for frame in frames:
+        event_type = frame.get("event")
+
+        if event_type == "on_chat_model_end":
+            stream_filter.end_run(frame.get("run_id"))
+
+        if event_type != "on_chat_model_stream":
+            yield frame
+            continue
+
+        message_id = getattr(frame["data"]["chunk"], "id", None)
+        text, tool_call_chunks = stream_filter.filter(frame)
+
+        if text:
+            yield {
+                "event": "on_copilotkit_text_delta",
+                "message_id": message_id,
+                "delta": text,
+            }
+
+        for tool_call_chunk in tool_call_chunks:
+            tool_call_delta = {
+                "event": "on_copilotkit_tool_call_delta",
+                "tool_call_id": tool_call_chunk["id"],
+                "args_delta": tool_call_chunk.get("args") or "",
+            }
+            if tool_call_chunk.get("name") is not None:
+                tool_call_delta["name"] = tool_call_chunk["name"]
+                tool_call_delta["message_id"] = message_id
+            yield tool_call_delta
+
+HEARTBEAT_EVENT = "on_copilotkit_heartbeat"
+
+_END = object()
+
+async def coalesce_writes( # pylint: disable=too-many-branches
+        chunks: AsyncIterator[Any],
+        *,
+        max_delay: float = 0.005,
+        max_bytes: int = 64 * 1024,
+        heartbeat_interval: Optional[float] = 15.0,
+        heartbeat: bytes = b'{"event": "' + HEARTBEAT_EVENT.encode() + b'"}\n',
+        max_pending: int = 1000
+    ) -> AsyncIterator[bytes]:
+    """
+    Turn a stream of encoded frames (str or bytes) into fewer, larger writes.
+
+    Frames that arrive within `max_delay` seconds of the first frame of a write
+    are joined into one write of up to `max_bytes`. If no frame arrives for
+    `heartbeat_interval` seconds, e.g. during a long tool call, `heartbeat` is
+    written so that proxies and clients don't time out the connection.
+    Frames must be complete lines, heartbeats are only written between them.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(max_pending)
+
+    async def produce():
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        except Exception as exc: # pylint: disable=broad-except
+            await queue.put(exc)
+        else:
+            await queue.put(_END)
+
+    producer = asyncio.create_task(produce())
+    end: Any = None
+
+    try:
+        while end is None:
+            try:
+                item = await asyncio.wait_for(queue.get(), heartbeat_interval)
+            except asyncio.TimeoutError:
+                yield heartbeat
+                continue
+
+            batch: List[bytes] = []
+            size = 0
+            deadline = loop.time() + max_delay
+            while True:
+                if item is _END or isinstance(item, Exception):
+                    end = item
+                    break
+                batch.append(item)
+                size += len(item)
+                if size >= max_bytes:
+                    break
+                if queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = queue.get_nowait()
+
+            if batch:
+                yield b"".join(batch)
+
+        if isinstance(end, Exception):
+            raise end
+    finally:
+        producer.cancel()
+
+SESSION_EVENT = "on_copilotkit_session"
+INTERN_EVENT = "on_copilotkit_intern"
+
+# fields that are the same for the whole stream, sent once in the session header
+_SESSION_FIELDS = ("thread_id", "agent_name", "role")
+# fields whose values repeat across frames, replaced by references to interned values
+_INTERNED_FIELDS = (
+    "run_id",
+    "node_name",
+    "name",
+    "tool_call_id",
+    "message_id",
+    "metadata",
+    "parent_ids",
+    "tags",
+)
+
+def _intern_key(value: Any) -> Any:
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, sort_keys=True, default=str)
+
+async def session_header_frames(frames: AsyncIterator[Frame]) -> AsyncIterator[Frame]:
+    """
+    Stop repeating the same values in every frame.
+
+    Session fields (thread id, agent name and role) are sent in a header:
+    `{"event": "on_copilotkit_session", "thread_id", "agent_name", "role", "fields"}`
+    and left out of the frames, unless their value differs. "fields" maps event
+    types to the session fields their frames carry. The header is sent again
+    when it changes, e.g. when the first frame of another event type carries
+    session fields.
+
+    Values of fields that repeat, like run ids, node and tool names and metadata,
+    are interned: the first time a value is used, it is sent inline. When it's
+    used again, it is announced with
+    `{"event": "on_copilotkit_intern", "id": <int>, "value": ...}`, then frames
+    reference it by its id. Values that are only used once, like the ids of
+    most messages, are never interned.
+
+    See `expand_session_frames` for the reverse transformation.
+    """
+    header: Frame = {"event": SESSION_EVENT, "fields": {}}
+    interned: Dict[Any, int] = {}
+    # values that were sent inline once
+    seen: Set[Any] = set()
+
+    async for frame in frames:
+        event_type = frame.get("event")
+        session_fields = [field for field in _SESSION_FIELDS if field in frame]
+
+        if session_fields:
+            header_changed = False
+            for field in session_fields:
+                if field not in header:
+                    header[field] = frame[field]
+                    header_changed = True
+            known_fields = header["fields"].get(event_type, [])
+            stripped_fields = [
+                field for field in session_fields if header[field] == frame[field]
+            ]
+            if any(field not in known_fields for field in stripped_fields):
+                header["fields"] = {
+                    **header["fields"],
+                    event_type: sorted(set(known_fields) | set(stripped_fields))
+                }
+                header_changed = True
+            if header_changed:
+                yield dict(header)
+
+        compact = {}
+        for field, value in frame.items():
+            if field in _SESSION_FIELDS and header.get(field) == value:
+                continue
+            if field in _INTERNED_FIELDS and isinstance(value, (str, dict, list)):
+                key = _intern_key(value)
+                reference = interned.get(key)
+                if reference is None and key in seen:
+                    seen.discard(key)
+                    reference = interned[key] = len(interned)
+                    yield {"event": INTERN_EVENT, "id": reference, "value": value}
+                elif reference is None:
+                    seen.add(key)
+                if reference is not None:
+                    value = reference
+            compact[field] = value
+        yield compact
+
+async def expand_session_frames(frames: AsyncIterator[Frame]) -> AsyncIterator[Frame]:
+    """Reference decoder for `session_header_frames`, restoring the original frames"""
+    header: Frame = {"fields": {}}
+    values: Dict[int, Any] = {}
+
+    async for frame in frames:
+        event_type = frame.get("event")
+        if event_type == SESSION_EVENT:
+            header = frame
+            continue
+        if event_type == INTERN_EVENT:
+            values[frame["id"]] = frame["value"]
+            continue
+
+        expanded = {
+            field: values[value] if field in _INTERNED_FIELDS and isinstance(value, int) else value
+            for field, value in frame.items()
+        }
+        for field in header["fields"].get(event_type, []):
+            if field not in expanded:
+                expanded[field] = header[field]
+        yield expanded
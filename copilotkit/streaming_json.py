@@ -0,0 +1,330 @@
+"""Incremental JSON parsing for streamed tool call arguments"""
+
+import re
+import json
+from typing import Any, List, Optional, Union
+
+_STRING_CHUNK = re.compile(r'[^"\\]+')
+# complete or incomplete hex digits of a \u escape
+_HEX_DIGITS = re.compile(r'[0-9a-fA-F]{0,4}')
+_WHITESPACE = " \t\n\r"
+_NUMBER_CHARS = "0123456789+-.eE"
+_LITERALS = {"true": True, "false": False, "null": None}
+_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+_MISSING = object()
+
+# parser states
+_VALUE = 0
+_KEY = 1
+_COLON = 2
+_AFTER_VALUE = 3
+_STRING = 4
+_NUMBER = 5
+_LITERAL = 6
+_DONE = 7
+
+class IncrementalJSONParser:
+    """
+    Parses a JSON document that arrives in chunks.
+
+    Only new input is processed on each call to `feed`, so parsing a document
+    of length n streamed in many chunks is O(n) instead of re-parsing the whole
+    buffer on every chunk. `value` returns the last parsable value of the
+    document so far, i.e. incomplete strings, numbers and literals are
+    included the way partialjson does it, keys without a value are left out.
+    """
+
+    def __init__(self):
+        self.error: Optional[str] = None
+        self._state = _VALUE
+        self._root: Any = _MISSING
+        # open containers, outermost first
+        self._stack: List[Union[dict, list]] = []
+        # current key for each open container (None for lists)
+        self._keys: List[Optional[str]] = []
+        self._string_parts: List[str] = []
+        self._string_is_key = False
+        self._token = ""
+        # input that can't be processed yet, e.g. an incomplete escape sequence
+        self._pending = ""
+        self._snapshot: Any = _MISSING
+
+    def feed(self, chunk: str):
+        """Feed the next chunk of the document"""
+        if self.error is not None or not chunk:
+            return
+
+        self._snapshot = _MISSING
+        text = self._pending + chunk if self._pending else chunk
+        self._pending = ""
+        pos = 0
+        length = len(text)
+
+        while pos < length:
+            state = self._state
+
+            if state == _STRING:
+                match = _STRING_CHUNK.match(text, pos)
+                if match is not None:
+                    self._string_parts.append(match.group())
+                    pos = match.end()
+                    continue
+                if text[pos] == '"':
+                    self._end_string()
+                    pos += 1
+                    continue
+                # escape sequence
+                consumed = self._read_escape(text, pos)
+                if consumed == 0:
+                    self._pending = text[pos:]
+                    return
+                pos += consumed
+                continue
+
+            char = text[pos]
+
+            if state in (_NUMBER, _LITERAL):
+                if char in (_NUMBER_CHARS if state == _NUMBER else "abcdefghijklmnopqrstuvwxyz"):
+                    self._token += char
+                    pos += 1
+                    continue
+                if not self._end_token():
+                    return
+                continue
+
+            if char in _WHITESPACE:
+                pos += 1
+                continue
+
+            if state == _VALUE:
+                self._start_value(char)
+            elif state == _KEY:
+                if char == '"':
+                    self._string_parts = []
+                    self._string_is_key = True
+                    self._state = _STRING
+                elif char == "}":
+                    self._close("}")
+                else:
+                    self._fail(char)
+            elif state == _COLON:
+                if char == ":":
+                    self._state = _VALUE
+                else:
+                    self._fail(char)
+            elif state == _AFTER_VALUE:
+                if char == ",":
+                    self._state = _KEY if isinstance(self._stack[-1], dict) else _VALUE
+                elif char in "}]":
+                    self._close(char)
+                else:
+                    self._fail(char)
+            else:
+                self._fail(char)
+
+            if self.error is not None:
+                return
+            pos += 1
+
+    def value(self) -> Any:
+        """
+        Get the last parsable value of the document.
+
+        Raises ValueError if nothing can be parsed yet or the document is invalid.
+        """
+        if self.error is not None:
+            raise ValueError(self.error)
+
+        if self._snapshot is _MISSING:
+            if self._root is _MISSING:
+                self._snapshot = self._partial_scalar()
+            elif not self._stack:
+                self._snapshot = self._root
+            else:
+                self._snapshot = self._copy_open_container(0)
+
+        if self._snapshot is _MISSING:
+            raise ValueError("No parsable value yet")
+
+        return self._snapshot
+
+    def _start_value(self, char: str):
+        if char == "{":
+            container: Union[dict, list] = {}
+        elif char == "[":
+            container = []
+        elif char == '"':
+            self._string_parts = []
+            self._string_is_key = False
+            self._state = _STRING
+            return
+        elif char == "-" or char.isdigit():
+            self._token = char
+            self._state = _NUMBER
+            return
+        elif char in "tfn":
+            self._token = char
+            self._state = _LITERAL
+            return
+        elif char == "]" and self._stack and isinstance(self._stack[-1], list):
+            self._close("]")
+            return
+        else:
+            self._fail(char)
+            return
+
+        self._put(container)
+        self._stack.append(container)
+        self._keys.append(None)
+        self._state = _KEY if char == "{" else _VALUE
+
+    def _put(self, value: Any):
+        if not self._stack:
+            self._root = value
+            self._state = _DONE
+            return
+
+        container = self._stack[-1]
+        if isinstance(container, dict):
+            container[self._keys[-1]] = value
+        else:
+            container.append(value)
+        self._state = _AFTER_VALUE
+
+    def _close(self, char: str):
+        container = self._stack[-1]
+        if (char == "}") != isinstance(container, dict):
+            self._fail(char)
+            return
+        self._stack.pop()
+        self._keys.pop()
+        self._state = _AFTER_VALUE if self._stack else _DONE
+
+    def _end_string(self):
+        string = "".join(self._string_parts)
+        self._string_parts = []
+        if self._string_is_key:
+            self._keys[-1] = string
+            self._state = _COLON
+        else:
+            self._put(string)
+
+    def _end_token(self) -> bool:
+        value = self._parse_token(self._token, complete=True)
+        if value is _MISSING:
+            self._fail(self._token)
+            return False
+        self._token = ""
+        self._put(value)
+        return True
+
+    def _read_escape(self, text: str, pos: int) -> int:
+        """Decode the escape sequence at pos, returns the number of chars consumed"""
+        if pos + 1 >= len(text):
+            return 0
+
+        char = text[pos + 1]
+        if char in _ESCAPES:
+            self._string_parts.append(_ESCAPES[char])
+            return 2
+
+        if char != "u":
+            self._fail(char)
+            return len(text) - pos
+
+        code = self._read_hex(text, pos + 2)
+        if code is None:
+            return 0 if self.error is None else len(text) - pos
+
+        # combine surrogate pairs
+        if 0xD800 <= code < 0xDC00:
+            following = text[pos + 6:pos + 8]
+            if following in ("", "\\"):
+                # wait for the low surrogate
+                return 0
+            if following == "\\u":
+                low = self._read_hex(text, pos + 8)
+                if low is None:
+                    return 0 if self.error is None else len(text) - pos
+                if 0xDC00 <= low < 0xE000:
+                    code = 0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)
+                    self._string_parts.append(chr(code))
+                    return 12
+
+        self._string_parts.append(chr(code))
+        return 6
+
+    def _read_hex(self, text: str, pos: int) -> Optional[int]:
+        """
+        Read the four hex digits of a \\u escape at pos. Returns None if they
+        are incomplete, or invalid in which case the parser fails.
+        """
+        digits = text[pos:pos + 4]
+        if not _HEX_DIGITS.fullmatch(digits):
+            self._fail(digits)
+            return None
+        if len(digits) < 4:
+            return None
+        return int(digits, 16)
+
+    def _parse_token(self, token: str, *, complete: bool) -> Any:
+        if self._state == _LITERAL:
+            if token in _LITERALS:
+                return _LITERALS[token]
+            if not complete:
+                for literal, value in _LITERALS.items():
+                    if literal.startswith(token):
+                        return value
+            return _MISSING
+
+        if not complete:
+            token = token.rstrip("+-.eE")
+        try:
+            return json.loads(token)
+        except ValueError:
+            return _MISSING
+
+    def _partial_scalar(self) -> Any:
+        if self._state == _STRING and not self._string_is_key:
+            return "".join(self._string_parts)
+        if self._state in (_NUMBER, _LITERAL):
+            return self._parse_token(self._token, complete=False)
+        return _MISSING
+
+    def _copy_open_container(self, level: int) -> Any:
+        """
+        Copy the open container at the given level.
+
+        Closed containers are never mutated again, so only the open containers
+        need to be copied, everything else is shared with previous snapshots.
+        """
+        container = self._stack[level]
+        copy = container.copy()
+
+        if level + 1 < len(self._stack):
+            child = self._copy_open_container(level + 1)
+        else:
+            child = self._partial_scalar()
+            if child is _MISSING:
+                return copy
+
+        if isinstance(copy, dict):
+            copy[self._keys[level]] = child
+        elif level + 1 < len(self._stack):
+            copy[-1] = child
+        else:
+            copy.append(child)
+        return copy
+
+    def _fail(self, char: str):
+        self.error = f"Unexpected character {char!r} in JSON document"
@@ -1,6 +1,6 @@
 """State for CopilotKit"""
 
-from typing import TypedDict
+from typing import TypedDict, Literal
 from enum import Enum
 from typing_extensions import NotRequired
 
@@ -37,3 +37,20 @@ class IntermediateStateConfig(TypedDict):
     state_key: str
     tool: str
     tool_argument: NotRequired[str]
+
+class StreamOptions(TypedDict):
+    """Agent event stream options requested by the client"""
+    compactEvents: NotRequired[bool]
+    # send session fields once in a header and intern repeated values,
+    # see stream.session_header_frames
+    sessionHeader: NotRequired[bool]
+    # encode messages and message chunks as {"type", "id", "content", ...}
+    # instead of LangChain's serialization format
+    compactMessages: NotRequired[bool]
+    # send state syncs as patches against the last sent state, only if the agent
+    # allows it with state_sync="delta", see stream.delta_state_syncs
+    deltaStateSync: NotRequired[bool]
+    # "msgpack" for length-prefixed MessagePack frames instead of JSON lines,
+    # negotiated by the integration from the Accept header, JSON lines are sent
+    # if no MessagePack library is installed
+    framing: NotRequired[Literal["json", "msgpack"]]
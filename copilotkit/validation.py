@@ -0,0 +1,148 @@
+"""Argument validation for CopilotKit actions"""
+
+import math
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypedDict, cast
+from .parameter import Parameter
+
+class ArgumentError(TypedDict):
+    """A validation error of an action argument"""
+    path: str
+    message: str
+
+# validates and coerces a value, appending errors for the value at path
+_Check = Callable[[Any, str, List[ArgumentError]], Any]
+
+ArgumentValidator = Callable[[dict], Tuple[dict, List[ArgumentError]]]
+
+def _check_string(value: Any, path: str, errors: List[ArgumentError]) -> Any:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    errors.append({"path": path, "message": "must be a string"})
+    return value
+
+def _check_number(value: Any, path: str, errors: List[ArgumentError]) -> Any:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            number = float(value)
+        except ValueError:
+            pass
+        else:
+            if math.isfinite(number):
+                return int(number) if number.is_integer() and "." not in value else number
+    errors.append({"path": path, "message": "must be a number"})
+    return value
+
+def _check_boolean(value: Any, path: str, errors: List[ArgumentError]) -> Any:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("true", "false"):
+        return value.lower() == "true"
+    errors.append({"path": path, "message": "must be a boolean"})
+    return value
+
+def _check_enum(check: _Check, enum: List[str]) -> _Check:
+    allowed = set(enum)
+    message = "must be one of " + ", ".join(repr(option) for option in enum)
+
+    def check_enum(value: Any, path: str, errors: List[ArgumentError]) -> Any:
+        value = check(value, path, errors)
+        if isinstance(value, str) and value not in allowed:
+            errors.append({"path": path, "message": message})
+        return value
+    return check_enum
+
+def _check_list(check: _Check) -> _Check:
+    def check_list(value: Any, path: str, errors: List[ArgumentError]) -> Any:
+        if not isinstance(value, list):
+            errors.append({"path": path, "message": "must be an array"})
+            return value
+        return [check(item, f"{path}[{i}]", errors) for i, item in enumerate(value)]
+    return check_list
+
+def _check_object(attributes: List[Parameter]) -> _Check:
+    fields = _compile_fields(attributes)
+
+    def check_object(value: Any, path: str, errors: List[ArgumentError]) -> Any:
+        if not isinstance(value, dict):
+            errors.append({"path": path, "message": "must be an object"})
+            return value
+        return _check_fields(fields, value, path + ".", errors)
+    return check_object
+
+_SCALAR_CHECKS: Dict[str, _Check] = {
+    "string": _check_string,
+    "number": _check_number,
+    "boolean": _check_boolean,
+}
+
+def _compile_parameter(parameter: Parameter) -> _Check:
+    parameter_type = parameter.get("type", "string")
+    item_type = parameter_type[:-2] if parameter_type.endswith("[]") else parameter_type
+
+    if item_type == "object":
+        attributes = cast(Any, parameter).get("attributes")
+        # objects without attributes are not checked any further
+        check = _check_object(attributes) if attributes else _check_any_object
+    else:
+        check = _SCALAR_CHECKS.get(item_type, _check_any)
+        enum = cast(Any, parameter).get("enum")
+        if enum:
+            check = _check_enum(check, enum)
+
+    return _check_list(check) if parameter_type.endswith("[]") else check
+
+def _check_any_object(value: Any, path: str, errors: List[ArgumentError]) -> Any:
+    if not isinstance(value, dict):
+        errors.append({"path": path, "message": "must be an object"})
+    return value
+
+def _check_any(value: Any, path: str, errors: List[ArgumentError]) -> Any: # pylint: disable=unused-argument
+    return value
+
+_Field = Tuple[str, bool, _Check]
+
+def _compile_fields(parameters: List[Parameter]) -> List[_Field]:
+    return [
+        (parameter["name"], parameter.get("required", True), _compile_parameter(parameter))
+        for parameter in parameters
+    ]
+
+def _check_fields(
+        fields: List[_Field],
+        value: dict,
+        prefix: str,
+        errors: List[ArgumentError]
+    ) -> dict:
+    # unknown fields are passed through
+    result = dict(value)
+    for name, required, check in fields:
+        field_value = value.get(name)
+        if field_value is None:
+            if required:
+                errors.append({"path": prefix + name, "message": "is required"})
+            continue
+        result[name] = check(field_value, prefix + name, errors)
+    return result
+
+def compile_validator(parameters: Optional[List[Parameter]]) -> ArgumentValidator:
+    """
+    Compile normalized parameters into a validator that checks the types,
+    required fields and enums of action arguments.
+
+    The validator returns the coerced arguments and a list of errors. Values
+    are coerced leniently where the intent is unambiguous, e.g. "3" to 3 for
+    numbers and "true" to True for booleans.
+    """
+    fields = _compile_fields(parameters or [])
+
+    def validate(arguments: dict) -> Tuple[dict, List[ArgumentError]]:
+        errors: List[ArgumentError] = []
+        if not isinstance(arguments, dict):
+            errors.append({"path": "", "message": "arguments must be an object"})
+            return arguments, errors
+        return _check_fields(fields, arguments, "", errors), errors
+    return validate
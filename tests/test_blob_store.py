@@ -0,0 +1,107 @@
+"""Tests for offloading action results to the blob store"""
+
+import json
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, MessagesState, StateGraph
+from copilotkit import BlobStore, CopilotKitSDK, LangGraphAgent
+from copilotkit.integrations.fastapi import add_fastapi_endpoint
+
+RESULT = {"rows": [{"i": i, "v": "x" * 10} for i in range(100)]}
+
+def offloaded(store: BlobStore) -> str:
+    """Offload RESULT, returning the result as the client sends it back"""
+    return json.dumps(store.offload(RESULT))
+
+def test_results_over_the_threshold_are_offloaded(tmp_path):
+    store = BlobStore(str(tmp_path), threshold=100, preview_size=10)
+    assert store.offload("small") == "small"
+    reference = store.offload(RESULT)["copilotkit_blob"]
+    assert reference["size"] == len(json.dumps(RESULT))
+    assert reference["preview"] == json.dumps(RESULT)[:10]
+    assert json.loads(store.read(reference["id"])) == RESULT
+
+def test_resolve_messages(tmp_path):
+    store = BlobStore(str(tmp_path), threshold=100)
+    messages = [
+        {"id": "1", "role": "user", "content": "hi", "createdAt": "now"},
+        {"id": "2", "actionExecutionId": "a", "actionName": "big", "result": offloaded(store)},
+        {"id": "3", "actionExecutionId": "b", "actionName": "small", "result": "ok"},
+    ]
+    resolved = asyncio.run(store.resolve_messages(messages))
+    assert json.loads(resolved[1]["result"]) == RESULT
+    assert resolved[0] is messages[0] and resolved[2] is messages[2]
+    assert messages[1]["result"] != resolved[1]["result"]
+
+def test_agents_receive_resolved_results(tmp_path):
+    store = BlobStore(str(tmp_path), threshold=100)
+    converted = []
+
+    def convert_messages(messages):
+        converted.extend(messages)
+        return []
+
+    graph = StateGraph(MessagesState)
+    graph.add_node("node", lambda state: {})
+    graph.set_entry_point("node")
+    graph.add_edge("node", END)
+    sdk = CopilotKitSDK(
+        agents=[LangGraphAgent(
+            name="agent",
+            graph=graph.compile(checkpointer=MemorySaver()),
+            copilotkit_config={"convert_messages": convert_messages}
+        )],
+        blob_store=store
+    )
+    app = FastAPI()
+    add_fastapi_endpoint(app, sdk, "/copilotkit")
+    response = TestClient(app).post("/copilotkit/agents/execute", json={
+        "name": "agent",
+        "threadId": "thread",
+        "state": {},
+        "messages": [
+            {"id": "1", "actionExecutionId": "a", "actionName": "big", "result": offloaded(store)},
+        ],
+    })
+    assert response.status_code == 200
+    assert json.loads(converted[0]["result"]) == RESULT
+
+@pytest.fixture(name="blob")
+def fixture_blob(tmp_path):
+    store = BlobStore(str(tmp_path), threshold=100)
+    blob_id = store.offload(RESULT)["copilotkit_blob"]["id"]
+    app = FastAPI()
+    add_fastapi_endpoint(app, CopilotKitSDK(blob_store=store), "/copilotkit")
+    return TestClient(app), f"/copilotkit/blobs/{blob_id}", json.dumps(RESULT).encode("utf-8")
+
+def test_read_blob_pages(blob):
+    client, path, data = blob
+    assert client.get(path).content == data
+    response = client.get(path, headers={"Range": "bytes=0-9"})
+    assert response.status_code == 206
+    assert response.content == data[:10]
+    assert response.headers["content-range"] == f"bytes 0-9/{len(data)}"
+    assert client.get(path, headers={"Range": "bytes=-5"}).content == data[-5:]
+    assert client.get(f"{path}?offset=10&limit=15").content == data[10:25]
+    assert client.get(f"{path}?offset={len(data)}").status_code == 416
+
+@pytest.mark.parametrize("query, headers", [
+    ("?offset=-5", {}),
+    ("?limit=-5", {}),
+    ("?offset=a", {}),
+    ("", {"Range": "bytes=-5-"}),
+    ("", {"Range": "bytes=5-3"}),
+    ("", {"Range": "bytes=0-1,4-5"}),
+    ("", {"Range": "items=0-1"}),
+])
+def test_invalid_ranges_are_rejected(blob, query, headers):
+    client, path, _ = blob
+    assert client.get(path + query, headers=headers).status_code == 400
+
+def test_missing_blobs(blob):
+    client, _, _ = blob
+    assert client.get("/copilotkit/blobs/" + "0" * 64).status_code == 404
+    assert client.get("/copilotkit/blobs/invalid").status_code == 404
@@ -0,0 +1,137 @@
+"""Tests for action result caching"""
+
+import asyncio
+import pytest
+from copilotkit.cache import ActionCache, SQLiteCacheBackend
+
+def test_concurrent_calls_execute_once():
+    cache = ActionCache()
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"value": 1}
+
+    async def run():
+        results = await asyncio.gather(*[
+            cache.get_or_execute("key", execute) for _ in range(5)
+        ])
+        assert results == [{"value": 1}] * 5
+        assert await cache.get_or_execute("key", execute) == {"value": 1}
+
+    asyncio.run(run())
+    assert len(calls) == 1
+
+def test_cancelling_the_first_caller_does_not_cancel_the_others():
+    cache = ActionCache()
+
+    async def run():
+        event = asyncio.Event()
+
+        async def execute():
+            event.set()
+            await asyncio.sleep(0.01)
+            return "result"
+
+        leader = asyncio.ensure_future(cache.get_or_execute("key", execute))
+        await event.wait()
+        follower = asyncio.ensure_future(cache.get_or_execute("key", execute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == "result"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    asyncio.run(run())
+
+def test_execution_is_cancelled_once_all_callers_are_gone():
+    cache = ActionCache()
+    cancelled = []
+
+    async def run():
+        async def execute():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+
+        callers = [asyncio.ensure_future(cache.get_or_execute("key", execute)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert not cache._in_flight # pylint: disable=protected-access
+
+    asyncio.run(run())
+    assert cancelled == [True]
+
+def test_errors_are_shared_and_not_cached():
+    cache = ActionCache()
+    calls = []
+
+    async def execute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    async def run():
+        results = await asyncio.gather(*[
+            cache.get_or_execute("key", execute) for _ in range(3)
+        ], return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        with pytest.raises(ValueError):
+            await cache.get_or_execute("key", execute)
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+def test_sqlite_backend_expires_values(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"))
+
+    async def run():
+        await backend.set("expired", b"1", -1)
+        await backend.set("fresh", b"2", None)
+        assert await backend.get("expired") is None
+        assert await backend.get("fresh") == b"2"
+
+    asyncio.run(run())
+    rows = backend._connection.execute( # pylint: disable=protected-access
+        "SELECT key FROM copilotkit_cache"
+    ).fetchall()
+    assert rows == [("fresh",)]
+
+def test_sqlite_backend_evicts_least_recently_used(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"), max_entries=2)
+
+    async def run():
+        await backend.set("a", b"1", None)
+        await backend.set("b", b"2", None)
+        await asyncio.sleep(0.01)
+        assert await backend.get("a") == b"1"
+        await backend.set("c", b"3", None)
+        assert await backend.get("a") == b"1"
+        assert await backend.get("b") is None
+        assert await backend.get("c") == b"3"
+
+    asyncio.run(run())
+
+def test_sqlite_backend_limits_bytes(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"), max_bytes=10)
+
+    async def run():
+        await backend.set("a", b"x" * 4, None)
+        await backend.set("b", b"x" * 4, None)
+        await backend.set("c", b"x" * 4, None)
+        assert await backend.get("a") is None
+        assert await backend.get("b") == b"x" * 4
+        assert await backend.get("c") == b"x" * 4
+
+    asyncio.run(run())
+
+def test_sqlite_backend_is_usable_across_event_loops(tmp_path):
+    backend = SQLiteCacheBackend(str(tmp_path / "cache.db"))
+    asyncio.run(backend.set("a", b"1", None))
+    assert asyncio.run(backend.get("a")) == b"1"
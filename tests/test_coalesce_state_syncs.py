@@ -0,0 +1,52 @@
+"""Tests for coalescing state syncs"""
+
+import asyncio
+from typing import List
+from copilotkit.stream import coalesce_state_syncs
+
+def sync(n: int, active: bool = True) -> dict:
+    """Make a state sync frame"""
+    return {"event": "on_copilotkit_state_sync", "state": {"n": n}, "active": active}
+
+def token(text: str) -> dict:
+    """Make a token frame"""
+    return {"event": "on_copilotkit_text_delta", "message_id": "1", "delta": text}
+
+MESSAGE = {"event": "on_copilotkit_emit_message", "message": "hi"}
+
+def coalesce(frames: List[dict], min_interval: float = 10, delay: float = 0) -> List[dict]:
+    """Run frames through coalesce_state_syncs, producing one every `delay` seconds"""
+    async def produce():
+        for frame in frames:
+            yield frame
+            await asyncio.sleep(delay)
+
+    async def run():
+        return [
+            frame async for frame in coalesce_state_syncs(produce(), min_interval=min_interval)
+        ]
+    return asyncio.run(run())
+
+def test_pending_state_sync_is_sent_before_other_frames():
+    frames = [sync(1), sync(2), MESSAGE, sync(3)]
+    assert coalesce(frames, delay=0.01) == frames
+
+def test_node_exit_state_sync_is_not_held_back():
+    frames = [sync(1), sync(2, active=False), MESSAGE]
+    assert coalesce(frames, delay=0.01) == frames
+
+def test_state_syncs_are_coalesced_while_tokens_stream():
+    frames = [sync(0)]
+    for i in range(1, 20):
+        frames += [token(str(i)), sync(i)]
+    sent = coalesce(frames)
+    assert [frame for frame in sent if frame["event"] != "on_copilotkit_state_sync"] == [
+        token(str(i)) for i in range(1, 20)
+    ]
+    syncs = [frame for frame in sent if frame["event"] == "on_copilotkit_state_sync"]
+    # the first state sync may already be replaced before it's sent
+    assert syncs in ([sync(0), sync(19)], [sync(19)])
+
+def test_frames_are_kept_in_order_without_an_interval():
+    frames = [sync(1), token("a"), sync(2), MESSAGE, sync(3, active=False)]
+    assert coalesce(frames, min_interval=0) == frames
@@ -0,0 +1,80 @@
+"""Tests for agents implementing the Agent interface themselves"""
+
+import json
+from typing import List, Optional
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from copilotkit import BlobStore, CopilotKitSDK
+from copilotkit.agent import Agent
+from copilotkit.action import ActionDict
+from copilotkit.integrations.fastapi import add_fastapi_endpoint
+from copilotkit.types import Message
+
+class BaselineAgent(Agent):
+    """Agent written against the first version of Agent.execute"""
+
+    def execute( # pylint: disable=too-many-arguments
+        self,
+        *,
+        state: dict,
+        messages: List[Message],
+        thread_id: Optional[str] = None,
+        node_name: Optional[str] = None,
+        actions: Optional[List[ActionDict]] = None,
+    ):
+        async def events():
+            yield json.dumps({"event": "on_custom", "messages": len(messages)}) + "\n"
+        return events()
+
+class KeywordsAgent(Agent):
+    """Agent taking any keyword arguments"""
+
+    def __init__(self):
+        super().__init__(name="keywords")
+        self.arguments: dict = {}
+
+    def execute(self, **kwargs): # pylint: disable=arguments-differ
+        self.arguments = kwargs
+
+        async def events():
+            yield json.dumps({"event": "on_custom"}) + "\n"
+        return events()
+
+@pytest.fixture(name="setup")
+def fixture_setup(tmp_path):
+    keywords_agent = KeywordsAgent()
+    sdk = CopilotKitSDK(
+        agents=[BaselineAgent(name="baseline"), keywords_agent],
+        blob_store=BlobStore(str(tmp_path))
+    )
+    app = FastAPI()
+    add_fastapi_endpoint(app, sdk, "/copilotkit")
+    return TestClient(app), keywords_agent
+
+def execute(client: TestClient, name: str):
+    """Execute an agent with all optional request fields set"""
+    return client.post("/copilotkit/agents/execute", headers={
+        "Accept": "application/x-msgpack",
+    }, json={
+        "name": name,
+        "threadId": "thread",
+        "state": {},
+        "messages": [{"id": "1", "role": "user", "content": "hi", "createdAt": "now"}],
+        "streamOptions": {"compactEvents": True},
+        "lastMessageId": "0",
+    })
+
+def test_agents_written_for_the_first_version_keep_working(setup):
+    client, _ = setup
+    response = execute(client, "baseline")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert json.loads(response.text) == {"event": "on_custom", "messages": 1}
+
+def test_optional_arguments_are_passed_when_taken(setup):
+    client, keywords_agent = setup
+    assert execute(client, "keywords").status_code == 200
+    assert keywords_agent.arguments["stream_options"]["compactEvents"] is True
+    assert keywords_agent.arguments["last_message_id"] == "0"
+    assert isinstance(keywords_agent.arguments["blob_store"], BlobStore)
@@ -0,0 +1,106 @@
+"""Tests for emitting intermediate state from nodes"""
+
+import json
+import asyncio
+import threading
+from typing import Any, Dict, List
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, StateGraph
+from copilotkit import CopilotKitSDK, CopilotKitState, LangGraphAgent
+from copilotkit.integrations.fastapi import add_fastapi_endpoint
+from copilotkit.langchain import _snapshot_state, copilotkit_emit_state # pylint: disable=protected-access
+
+class State(CopilotKitState):
+    """State of the test graph"""
+    logs: List[Dict[str, Any]]
+    status: str
+
+async def emit_progress(state, config):
+    """Emit the state, then keep updating it in place like the demo nodes do"""
+    state["logs"] = [{"message": "download", "done": False}]
+    state["status"] = "started"
+    await copilotkit_emit_state(config, state)
+    state["logs"][0]["done"] = True
+    await copilotkit_emit_state(config, state)
+    state["logs"].append({"message": "summarize", "done": False})
+    state["status"] = "running"
+    await copilotkit_emit_state(config, state)
+    state["logs"][1]["done"] = True
+    return {"logs": state["logs"], "status": "done"}
+
+EMITTED = [
+    ("started", [{"message": "download", "done": False}]),
+    ("started", [{"message": "download", "done": True}]),
+    ("running", [{"message": "download", "done": True}, {"message": "summarize", "done": False}]),
+]
+
+def make_client(copilotkit_config: dict) -> TestClient:
+    """Serve a graph running emit_progress"""
+    graph = StateGraph(State)
+    graph.add_node("node", emit_progress)
+    graph.set_entry_point("node")
+    graph.add_edge("node", END)
+    sdk = CopilotKitSDK(agents=[LangGraphAgent(
+        name="agent",
+        graph=graph.compile(checkpointer=MemorySaver()),
+        copilotkit_config=copilotkit_config
+    )])
+    app = FastAPI()
+    add_fastapi_endpoint(app, sdk, "/copilotkit")
+    return TestClient(app)
+
+def state_syncs(client: TestClient) -> List[tuple]:
+    """Execute the agent, returning the (status, logs) of its state syncs"""
+    response = client.post("/copilotkit/agents/execute", json={
+        "name": "agent",
+        "threadId": "thread",
+        "state": {},
+        "messages": [{"id": "1", "role": "user", "content": "hi", "createdAt": "now"}],
+    })
+    return [
+        (frame["state"].get("status"), frame["state"].get("logs"))
+        for frame in map(json.loads, response.text.splitlines())
+        if frame["event"] == "on_copilotkit_state_sync"
+    ]
+
+def without_repeats(states: List[tuple]) -> List[tuple]:
+    """Drop consecutive duplicates"""
+    return [state for i, state in enumerate(states) if i == 0 or states[i - 1] != state]
+
+def test_nested_updates_after_emitting_are_sent():
+    states = without_repeats(state_syncs(make_client({})))
+    emitted = [state for state in states if state[0] in ("started", "running")]
+    assert emitted == EMITTED
+    assert states[-1] == ("done", [
+        {"message": "download", "done": True},
+        {"message": "summarize", "done": True},
+    ])
+
+def test_nested_updates_after_emitting_are_sent_without_an_agent():
+    emitted = []
+
+    async def run():
+        async for event in RunnableLambda(emit_progress).astream_events({}, version="v1"):
+            if event["event"] == "on_chain_end" and event["metadata"].get(
+                "copilotkit:force-emit-intermediate-state"
+            ):
+                output = event["data"]["output"]
+                emitted.append((output["status"], output["logs"]))
+
+    asyncio.run(run())
+    assert emitted == EMITTED
+
+def test_snapshot_copies_nested_values():
+    lock = threading.Lock()
+    messages = [{"id": "1"}]
+    state = {"messages": messages, "logs": [{"done": False}], "data": {"b": [2]}, "lock": lock}
+    snapshot = _snapshot_state(state)
+    state["logs"][0]["done"] = True
+    state["data"]["b"].append(3)
+    assert snapshot == {"messages": messages, "logs": [{"done": False}], "data": {"b": [2]}, "lock": lock}
+    # messages are not part of state syncs, values that can't be copied are shared
+    assert snapshot["messages"] is messages
+    assert snapshot["lock"] is lock
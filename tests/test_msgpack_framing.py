@@ -0,0 +1,102 @@
+"""Tests for length-prefixed MessagePack framing"""
+
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langchain_core.messages import AIMessageChunk, HumanMessage, ToolMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, MessagesState, StateGraph
+from copilotkit import CopilotKitSDK, LangGraphAgent, msgpack_framing
+from copilotkit.integrations.fastapi import add_fastapi_endpoint
+from copilotkit.msgpack_framing import FrameDecoder, decode_frames, pack_frame
+from copilotkit.serializer import FrameEncoder
+
+FRAMES = [
+    {
+        "event": "on_chat_model_stream",
+        "data": {"chunk": AIMessageChunk(content="hi", id="run-1")},
+        "metadata": {"langgraph_node": "agent", "ids": [1, 2]},
+    },
+    {
+        "event": "on_copilotkit_state_sync",
+        "state": {
+            "messages": [HumanMessage(content="hey", id="1"), ToolMessage(
+                content="result", tool_call_id="call", id="2"
+            )],
+            "nested": {"values": [{"a": None, "b": 1.5, "c": True}]},
+        },
+    },
+]
+
+@pytest.mark.parametrize("compact_messages", [False, True])
+def test_frames_have_the_same_schema_as_json_lines(compact_messages):
+    encoder = FrameEncoder(compact_messages=compact_messages)
+    for frame in FRAMES:
+        unpacked = list(decode_frames([pack_frame(frame, encoder)]))[0]
+        assert unpacked == json.loads(encoder.encode(frame))
+
+def test_non_string_keys_are_kept():
+    frame = {"event": "on_copilotkit_state_sync", "state": {1: "a", "b": {2: "c"}}}
+    assert list(decode_frames([pack_frame(frame)])) == [frame]
+
+def test_decoder_handles_any_chunking():
+    stream = b"".join(pack_frame(frame) for frame in FRAMES)
+    expected = list(decode_frames([stream]))
+    for size in (1, 3, 7, 64):
+        decoder = FrameDecoder()
+        frames = []
+        for i in range(0, len(stream), size):
+            frames.extend(decoder.feed(stream[i:i + size]))
+        assert frames == expected
+        assert decoder.pending == 0
+
+def test_truncated_stream_fails():
+    with pytest.raises(ValueError):
+        list(decode_frames([pack_frame(FRAMES[0])[:-1]]))
+
+@pytest.fixture(name="client")
+def fixture_client():
+    graph = StateGraph(MessagesState)
+    graph.add_node("node", lambda state: {})
+    graph.set_entry_point("node")
+    graph.add_edge("node", END)
+    sdk = CopilotKitSDK(agents=[LangGraphAgent(
+        name="agent",
+        graph=graph.compile(checkpointer=MemorySaver())
+    )])
+    app = FastAPI()
+    add_fastapi_endpoint(app, sdk, "/copilotkit")
+    return TestClient(app)
+
+def execute(client, **kwargs):
+    """Execute the test agent"""
+    return client.post("/copilotkit/agents/execute", json={
+        "name": "agent",
+        "threadId": "thread",
+        "state": {},
+        "messages": [{"id": "1", "role": "user", "content": "hi", "createdAt": "now"}],
+    }, **kwargs)
+
+def test_msgpack_is_negotiated_from_the_accept_header(client):
+    response = execute(client, headers={"Accept": "application/x-msgpack"})
+    assert response.headers["content-type"] == "application/x-msgpack"
+    frames = list(decode_frames([response.content]))
+    assert frames and all("event" in frame for frame in frames)
+
+def test_falls_back_to_json_lines_without_a_msgpack_library(client, monkeypatch):
+    monkeypatch.setattr(msgpack_framing, "ormsgpack", None)
+    monkeypatch.setattr(msgpack_framing, "msgpack", None)
+    response = execute(client, headers={"Accept": "application/x-msgpack"})
+    assert response.headers["content-type"] == "application/x-ndjson"
+
+    response = client.post("/copilotkit/agents/execute", json={
+        "name": "agent",
+        "threadId": "thread-2",
+        "state": {},
+        "messages": [{"id": "1", "role": "user", "content": "hi", "createdAt": "now"}],
+        "streamOptions": {"framing": "msgpack"},
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert all(json.loads(line) for line in response.text.splitlines())
@@ -0,0 +1,40 @@
+"""Tests for the frame encoder"""
+
+import copy
+import json
+from langchain_core.messages import AIMessageChunk
+from langchain_core.load.dump import dumps
+from copilotkit.serializer import FrameEncoder
+
+def state_sync(state: dict) -> dict:
+    """Make a state sync frame"""
+    return {"event": "on_copilotkit_state_sync", "node_name": "node", "state": state}
+
+def test_frames_are_encoded_like_langchain_dumps():
+    frame = {"event": "on_chat_model_stream", "data": {"chunk": AIMessageChunk(content="hi")}}
+    encoded = FrameEncoder().encode(frame)
+    assert encoded.endswith(b"\n")
+    assert json.loads(encoded) == json.loads(dumps(frame))
+
+def test_state_syncs_are_encoded_in_full():
+    encoder = FrameEncoder()
+    state = {"a": [1, 2], "b": {"c": None}}
+    assert json.loads(encoder.encode(state_sync(state))) == state_sync(state)
+    assert json.loads(encoder.encode(state_sync({}))) == state_sync({})
+
+def test_values_mutated_in_place_are_encoded_again():
+    encoder = FrameEncoder()
+    logs = [{"message": "download", "done": False}]
+    encoder.encode(state_sync({"logs": logs}))
+    logs[0]["done"] = True
+    # the next state holds an equal value that is a different object
+    encoded = encoder.encode(state_sync({"logs": copy.deepcopy(logs)}))
+    assert json.loads(encoded)["state"]["logs"] == [{"message": "download", "done": True}]
+
+def test_unchanged_values_are_reused():
+    encoder = FrameEncoder()
+    logs = [{"done": False}]
+    first = encoder.encode(state_sync({"logs": logs, "status": "a"}))
+    second = encoder.encode(state_sync({"logs": logs, "status": "b"}))
+    assert json.loads(first)["state"]["logs"] == json.loads(second)["state"]["logs"]
+    assert json.loads(second)["state"]["status"] == "b"
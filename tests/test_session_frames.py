@@ -0,0 +1,44 @@
+"""Tests for session headers and interned values in agent streams"""
+
+import asyncio
+from copilotkit.stream import INTERN_EVENT, expand_session_frames, session_header_frames
+
+def frame(event: str, **fields) -> dict:
+    """Make a frame with the session fields set"""
+    return {"event": event, "thread_id": "thread", "agent_name": "agent", "role": "assistant", **fields}
+
+FRAMES = [
+    frame("on_copilotkit_state_sync", run_id="run", node_name="node", state={"a": 1}),
+    frame("on_copilotkit_emit_message", message_id="message-1", message="hi"),
+    frame("on_copilotkit_emit_message", message_id="message-2", message="there"),
+    frame("on_copilotkit_state_sync", run_id="run", node_name="node", state={"a": 2}),
+    {"event": "on_chat_model_stream", "run_id": "run", "tags": ["a"], "metadata": {"b": [1]}},
+    {"event": "on_chat_model_stream", "run_id": "run", "tags": ["a"], "metadata": {"b": [1]}},
+    frame("on_copilotkit_state_sync", run_id="run", node_name="other", state={}, thread_id="other"),
+]
+
+async def collect(frames):
+    return [item async for item in frames]
+
+async def iterate(frames):
+    for item in frames:
+        yield item
+
+def compact(frames):
+    """Run frames through session_header_frames"""
+    return asyncio.run(collect(session_header_frames(iterate(frames))))
+
+def test_round_trip():
+    compacted = compact(FRAMES)
+    assert asyncio.run(collect(expand_session_frames(iterate(compacted)))) == FRAMES
+
+def test_values_are_interned_when_they_repeat():
+    interned = [item["value"] for item in compact(FRAMES) if item["event"] == INTERN_EVENT]
+    assert interned == ["run", "node", ["a"], {"b": [1]}]
+
+def test_values_used_once_are_sent_inline():
+    compacted = compact(FRAMES)
+    messages = [item for item in compacted if item["event"] == "on_copilotkit_emit_message"]
+    assert [item["message_id"] for item in messages] == ["message-1", "message-2"]
+    assert compacted[1]["run_id"] == "run"
+    assert "thread_id" not in compacted[1]
@@ -0,0 +1,141 @@
+"""Tests for state sync events of LangGraph agents"""
+
+import copy
+import json
+import asyncio
+from typing import Any, Dict, List
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, MessagesState, StateGraph
+from copilotkit import CopilotKitSDK, LangGraphAgent
+from copilotkit.integrations.fastapi import add_fastapi_endpoint
+from copilotkit.langchain import copilotkit_emit_state
+from copilotkit.stream import delta_state_syncs
+
+class State(MessagesState):
+    """State of the test graph"""
+    items: List[int]
+    logs: List[Dict[str, Any]]
+
+def apply_patch(document: Any, operations: List[dict]) -> Any:
+    """Apply the operations of a delta state sync"""
+    for operation in operations:
+        tokens = [
+            token.replace("~1", "/").replace("~0", "~")
+            for token in operation["path"].split("/")[1:]
+        ]
+        if not tokens:
+            document = operation["value"]
+            continue
+        parent = document
+        for token in tokens[:-1]:
+            parent = parent[int(token) if isinstance(parent, list) else token]
+        key: Any = tokens[-1]
+        if isinstance(parent, list) and key != "-":
+            key = int(key)
+        if operation["op"] == "add" and key == "-":
+            parent.append(operation["value"])
+        elif operation["op"] == "add" and isinstance(parent, list):
+            parent.insert(key, operation["value"])
+        elif operation["op"] in ("add", "replace"):
+            parent[key] = operation["value"]
+        elif operation["op"] == "append":
+            parent[key] += operation["value"]
+        else:
+            del parent[key]
+    return document
+
+async def update_logs(state, config):
+    """Emit the state, updating nested values in place in between"""
+    state["logs"] = [{"message": "download", "done": False}]
+    await copilotkit_emit_state(config, state)
+    state["logs"][0]["done"] = True
+    await copilotkit_emit_state(config, state)
+    state["logs"].append({"message": "summarize", "done": False})
+    await copilotkit_emit_state(config, state)
+    state["logs"][1]["done"] = True
+    await copilotkit_emit_state(config, state)
+    return {"logs": state["logs"]}
+
+def make_client(copilotkit_config: dict) -> TestClient:
+    """Serve a graph that appends to the state in every node"""
+    graph = StateGraph(State)
+    for node in ("first", "second", "third"):
+        graph.add_node(node, lambda state: {"items": state.get("items", []) + [1]})
+    graph.add_node("progress", update_logs)
+    graph.set_entry_point("first")
+    graph.add_edge("first", "second")
+    graph.add_edge("second", "progress")
+    graph.add_edge("progress", "third")
+    graph.add_edge("third", END)
+    sdk = CopilotKitSDK(agents=[LangGraphAgent(
+        name="agent",
+        graph=graph.compile(checkpointer=MemorySaver()),
+        copilotkit_config=copilotkit_config
+    )])
+    app = FastAPI()
+    add_fastapi_endpoint(app, sdk, "/copilotkit")
+    return TestClient(app)
+
+def state_syncs(client: TestClient, stream_options: dict) -> List[dict]:
+    """Execute the agent, returning its state sync frames"""
+    response = client.post("/copilotkit/agents/execute", json={
+        "name": "agent",
+        "threadId": "thread",
+        "state": {},
+        "messages": [{"id": "1", "role": "user", "content": "hi", "createdAt": "now"}],
+        "streamOptions": stream_options,
+    })
+    frames = [json.loads(line) for line in response.text.splitlines()]
+    return [frame for frame in frames if frame["event"] == "on_copilotkit_state_sync"]
+
+@pytest.mark.parametrize("copilotkit_config, stream_options", [
+    ({}, {}),
+    ({}, {"deltaStateSync": True}),
+    ({"state_sync": "delta"}, {}),
+])
+def test_full_state_syncs_unless_both_sides_opt_in(copilotkit_config, stream_options):
+    syncs = state_syncs(make_client(copilotkit_config), stream_options)
+    assert syncs and all("state" in sync and "delta" not in sync for sync in syncs)
+
+def test_delta_state_syncs():
+    config = {"state_sync": "delta"}
+    full = state_syncs(make_client(config), {})
+    delta = state_syncs(make_client(config), {"deltaStateSync": True})
+    assert "state" in delta[0]
+    assert any("delta" in sync for sync in delta[1:])
+
+    state = None
+    for sync, expected in zip(delta, full):
+        state = sync["state"] if "state" in sync else apply_patch(state, sync["delta"])
+        assert state == expected["state"]
+    assert any(
+        state.get("logs") == [{"message": "download", "done": True}]
+        for state in (sync["state"] for sync in full)
+    )
+
+def test_delta_state_syncs_of_states_mutated_in_place():
+    state = {"logs": [{"message": "download", "done": False}]}
+
+    async def frames():
+        yield {"event": "on_copilotkit_state_sync", "state": state}
+        state["logs"][0]["done"] = True
+        yield {"event": "on_copilotkit_state_sync", "state": state}
+        state["logs"].append({"message": "summarize", "done": False})
+        yield {"event": "on_copilotkit_state_sync", "state": state}
+
+    async def run():
+        sent, received = [], None
+        async for frame in delta_state_syncs(frames()):
+            sent.append(copy.deepcopy(state))
+            if "state" in frame:
+                received = copy.deepcopy(frame["state"])
+            else:
+                assert frame["delta"]
+                received = apply_patch(received, frame["delta"])
+            assert received == sent[-1]
+        return sent
+
+    assert len(asyncio.run(run())) == 3
@@ -0,0 +1,109 @@
+"""Tests for the incremental JSON parser"""
+
+import json
+import pytest
+from copilotkit.streaming_json import IncrementalJSONParser
+
+DOCUMENTS = [
+    '{"query": "weather in Berlin", "limit": 10, "exact": false}',
+    '{"a": [1, 2.5, -3e2, true, null, {"b": "c"}], "d": {}}',
+    '[{"nested": [[], [[]], {"x": {"y": "z"}}]}]',
+    '{"escapes": "quote \\" backslash \\\\ slash \\/ \\b\\f\\n\\r\\t"}',
+    '{"unicode": "caf\\u00e9 \\ud83d\\ude00 \\u4e2d"}',
+    '"just a string"',
+    '-12.5e-3',
+    '{ "spaced" :\n [ 1 ,\t2 ] }',
+]
+
+def parse_in_chunks(document: str, size: int) -> IncrementalJSONParser:
+    """Feed a document in chunks of the given size"""
+    parser = IncrementalJSONParser()
+    for i in range(0, len(document), size):
+        parser.feed(document[i:i + size])
+    return parser
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, 1000])
+def test_chunked_parse_matches_json_loads(document, size):
+    parser = parse_in_chunks(document, size)
+    assert parser.error is None
+    assert parser.value() == json.loads(document)
+
+@pytest.mark.parametrize("document", DOCUMENTS)
+def test_every_prefix_is_parsed_without_raising(document):
+    parser = IncrementalJSONParser()
+    for char in document:
+        parser.feed(char)
+        try:
+            parser.value()
+        except ValueError:
+            pass
+    assert parser.value() == json.loads(document)
+
+@pytest.mark.parametrize("document", [
+    '{"path": "C:\\users\\x"}',
+    '{"a": "\\uZZZZ"}',
+    '{"a": "\\u12G4"}',
+    '{"a": "\\ud83d\\uXYZW"}',
+    '{"a": "\\q"}',
+])
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_invalid_escapes_fail_without_raising(document, size):
+    parser = parse_in_chunks(document, size)
+    assert parser.error is not None
+    with pytest.raises(ValueError):
+        parser.value()
+
+def test_invalid_escape_keeps_previous_value_parsable():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a": 1, "path": "C:')
+    assert parser.value() == {"a": 1, "path": "C:"}
+    parser.feed('\\users"}')
+    with pytest.raises(ValueError):
+        parser.value()
+
+def test_surrogate_pair_split_across_chunks():
+    document = '"\\ud83d\\ude00"'
+    for split in range(1, len(document)):
+        parser = IncrementalJSONParser()
+        parser.feed(document[:split])
+        parser.feed(document[split:])
+        assert parser.value() == "\U0001F600"
+
+def test_lone_high_surrogate():
+    document = '"\\ud83d"'
+    assert parse_in_chunks(document, 1).value() == json.loads(document)
+    document = '"\\ud83d\\n"'
+    assert parse_in_chunks(document, 1).value() == json.loads(document)
+
+@pytest.mark.parametrize("prefix, expected", [
+    ('{"a": tr', {"a": True}),
+    ('{"a": f', {"a": False}),
+    ('{"a": nu', {"a": None}),
+    ('{"a": 12', {"a": 12}),
+    ('{"a": -', {}),
+    ('{"a": 1.', {"a": 1}),
+    ('{"a": 1.5e', {"a": 1.5}),
+    ('[1, 2', [1, 2]),
+    ('{"a": "partial', {"a": "partial"}),
+    ('{"a": 1, "b', {"a": 1}),
+    ('{"a": 1, "b":', {"a": 1}),
+])
+def test_partial_literals_and_numbers(prefix, expected):
+    parser = IncrementalJSONParser()
+    parser.feed(prefix)
+    assert parser.value() == expected
+
+def test_invalid_literal_fails():
+    parser = IncrementalJSONParser()
+    parser.feed('{"a": trux}')
+    with pytest.raises(ValueError):
+        parser.value()
+
+def test_snapshots_are_not_mutated_by_later_chunks():
+    parser = IncrementalJSONParser()
+    parser.feed('{"items": [1, 2')
+    snapshot = parser.value()
+    parser.feed(', 3], "done": true}')
+    assert snapshot == {"items": [1, 2]}
+    assert parser.value() == {"items": [1, 2, 3], "done": True}